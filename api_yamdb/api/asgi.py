@@ -0,0 +1,177 @@
+"""ASGI-приложение поверх синхронного обработчика Django.
+
+В Django 2.2 нет ни ASGI-обработчика, ни асинхронных представлений,
+поэтому запрос целиком принимается в цикле событий, представление
+выполняется в ограниченном пуле потоков, а ответ отдаётся клиенту снова
+из цикла событий. Поток занят только на время работы Django: медленный
+клиент держит соединение, но не поток.
+
+Чтение (списки и карточки произведений, отзывы, комментарии, жанры,
+категории) идёт в собственный пул, чтобы медленные записи и импорт не
+занимали все потоки.
+"""
+import asyncio
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+READ_METHODS = ('GET', 'HEAD')
+READ_PATHS = tuple(re.compile(pattern) for pattern in (
+    r'^/api/v1/titles/(\d+/)?$',
+    r'^/api/v1/titles/\d+/reviews/(\d+/)?$',
+    r'^/api/v1/titles/\d+/reviews/\d+/comments/(\d+/)?$',
+    r'^/api/v1/genres/$',
+    r'^/api/v1/categories/$',
+))
+
+
+def is_read_request(scope):
+    return (scope['method'] in READ_METHODS
+            and any(path.match(scope['path']) for path in READ_PATHS))
+
+
+def build_environ(scope, body):
+    """WSGI-окружение по ASGI scope, как это делает asgiref."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI ожидает путь в виде байтов, декодированных как latin-1.
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = (f'{environ[key]},{value}'
+                            if key in environ else value)
+    return environ
+
+
+class ASGIHandler:
+
+    def __init__(self, wsgi_application, threads, read_threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            threads, thread_name_prefix='asgi')
+        self.read_executor = ThreadPoolExecutor(
+            read_threads, thread_name_prefix='asgi-read')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                self.read_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                return body.getvalue()
+
+    def run_wsgi(self, environ):
+        """Выполняется в потоке пула.
+
+        Обычный ответ собирается и закрывается здесь же: close()
+        отправляет request_finished, а соединения с базой привязаны к
+        потоку. Потоковый ответ возвращается итератором и читается в
+        отдельном потоке (stream).
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers]
+
+        response = self.wsgi_application(environ, start_response)
+        if getattr(response, 'streaming', False):
+            return started, response
+        try:
+            return started, b''.join(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        executor = (self.read_executor if is_read_request(scope)
+                    else self.executor)
+        loop = asyncio.get_running_loop()
+        started, content = await loop.run_in_executor(
+            executor, self.run_wsgi, build_environ(scope, body))
+        await send({
+            'type': 'http.response.start',
+            'status': started['status'],
+            'headers': started['headers'],
+        })
+        if isinstance(content, bytes):
+            await send({'type': 'http.response.body', 'body': content})
+            return
+        await self.stream(loop, content, send)
+
+    async def stream(self, loop, response, send):
+        """Потоковый ответ читается и закрывается в одном своём потоке.
+
+        Курсор выгрузки принадлежит соединению с базой потока, который
+        его открыл, а request_finished другого запроса в потоке пула
+        закрыл бы это соединение посреди выгрузки.
+        """
+        executor = ThreadPoolExecutor(1, thread_name_prefix='asgi-stream')
+        chunks = iter(response)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    executor, partial(next, chunks, None))
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body',
+                                'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            try:
+                await loop.run_in_executor(executor, response.close)
+            finally:
+                executor.shutdown(wait=False)
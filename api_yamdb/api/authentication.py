@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from reviews.models import User
+
+TOKEN_VERSION_CLAIM = 'ver'
+# Поля пользователя, которые кладутся в токен и восстанавливаются из него.
+USER_CLAIMS = ('username', 'role', 'is_superuser', 'is_active')
+
+
+def token_version_key(user_id):
+    return f'token_version:{user_id}'
+
+
+def get_token_version(user_id):
+    """Текущая версия токенов пользователя: из кэша, при промахе из БД."""
+    version = cache.get(token_version_key(user_id))
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list(
+            'token_version', flat=True).first()
+        if version is None:
+            return None
+        cache.set(token_version_key(user_id), version,
+                  settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def forget_token_version(user_id):
+    cache.delete(token_version_key(user_id))
+
+
+def invalidate_tokens(user):
+    """Отзывает все выданные пользователю токены."""
+    User.objects.filter(pk=user.pk).update(
+        token_version=F('token_version') + 1)
+    forget_token_version(user.pk)
+
+
+def get_access_token(user):
+    token = AccessToken.for_user(user)
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    return token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация без запроса к таблице пользователей.
+
+    Пользователь собирается из claims токена, остальные поля отложены
+    и подгружаются только при обращении. Токены без claims (выданные
+    напрямую через simplejwt или до появления is_active в claims)
+    обрабатываются как раньше.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token
+               for claim in (TOKEN_VERSION_CLAIM, *USER_CLAIMS)):
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if get_token_version(user_id) != validated_token[TOKEN_VERSION_CLAIM]:
+            raise InvalidToken(_('Token has been revoked'))
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive')
+        claims = dict(
+            {claim: validated_token[claim] for claim in USER_CLAIMS},
+            id=user_id,
+            token_version=validated_token[TOKEN_VERSION_CLAIM],
+        )
+        field_names = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in claims
+        ]
+        return User.from_db(
+            DEFAULT_DB_ALIAS, field_names,
+            [claims[name] for name in field_names])
@@ -0,0 +1,392 @@
+"""Пакетная запись произведений, жанров и категорий.
+
+Элементы проверяются по одному переиспользуемому сериализатору, но без
+запросов к базе: slug жанров и категорий, id произведений и занятые slug
+разрешаются одним запросом на связь для всего пакета. Корректные
+элементы записываются одной транзакцией через bulk_create и
+bulk_update, ошибки возвращаются по индексам элементов.
+
+bulk_create и bulk_update не отправляют сигналы, поэтому версии таблиц,
+кэш ответов, поисковый индекс, рейтинги и журнал изменений обновляются
+здесь один раз на пакет.
+"""
+from api import cache
+from api.serializers import (CategorySerializer, GenreSerializer,
+                             TitleBulkSerializer, TitleBulkUpdateSerializer,
+                             category_fragments, genre_fragments)
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.relations import SlugRelatedField
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+from reviews.models import (CATEGORY_STAMP, CHANGE_CREATED, CHANGE_UPDATED,
+                            GENRE_STAMP, TITLE_STAMP, Category, ChangeEvent,
+                            Genre, TableVersion, Title, TitleGenre)
+from reviews.rankings import schedule_refresh
+from search.backends import get_backend
+from search.documents import title_document
+
+BATCH_SIZE = 500
+# Поля, по которым новые произведения находятся после вставки.
+TITLE_KEY = ('name', 'year', 'description', 'category_id')
+
+
+class BulkConflict(Exception):
+    """Пакет нарушил ограничение базы и откачен целиком."""
+
+
+def error(message, code='invalid'):
+    return [ErrorDetail(message, code=code)]
+
+
+def does_not_exist(slug):
+    message = SlugRelatedField.default_error_messages['does_not_exist']
+    return ErrorDetail(message.format(slug_name='slug', value=slug),
+                       code='does_not_exist')
+
+
+class BulkWriter:
+    """Проверяет и записывает пакет элементов.
+
+    Подклассы задают serializer_class, resolve() - проверки по базе
+    для всего пакета - и write() - саму запись.
+    """
+    serializer_class = None
+    partial = False
+    success_status = status.HTTP_201_CREATED
+    success_key = 'created'
+
+    def __init__(self, context):
+        self.context = context
+        self.child = self.get_child()
+
+    def get_child(self):
+        return self.serializer_class(context=self.context,
+                                     partial=self.partial)
+
+    def validate(self, items):
+        valid = {}
+        errors = {}
+        for index, item in enumerate(items):
+            try:
+                valid[index] = self.child.run_validation(item)
+            except serializers.ValidationError as e:
+                errors[index] = e.detail
+        return valid, errors
+
+    def resolve(self, valid, errors):
+        pass
+
+    def write(self, valid):
+        """Возвращает идентификаторы записанных элементов по индексам."""
+        raise NotImplementedError
+
+    def run(self, items):
+        valid, errors = self.validate(items)
+        self.resolve(valid, errors)
+        for index in errors:
+            valid.pop(index, None)
+        written = {}
+        if valid:
+            try:
+                with transaction.atomic():
+                    written = self.write(valid)
+            except IntegrityError as e:
+                raise BulkConflict(str(e))
+            self.written(valid, written)
+        return written, errors
+
+    def written(self, valid, written):
+        """Обновление зависимых данных после фиксации пакета."""
+
+    def results(self, items):
+        written, errors = self.run(items)
+        results = []
+        for index in range(len(items)):
+            if index in errors:
+                results.append({'index': index,
+                                'status': status.HTTP_400_BAD_REQUEST,
+                                'errors': errors[index]})
+            else:
+                results.append({'index': index,
+                                'status': self.success_status,
+                                **written[index]})
+        return len(written), len(errors), results
+
+
+def check_items(data):
+    if not isinstance(data, list):
+        raise serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: ['Ожидается список объектов']})
+    if not data:
+        raise serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: ['Список не может быть пуст']})
+    if len(data) > settings.BULK_MAX_ITEMS:
+        raise serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: [
+                f'Не больше {settings.BULK_MAX_ITEMS} объектов за запрос']})
+
+
+def response_status(writer, written, failed):
+    if not failed:
+        return writer.success_status
+    if not written:
+        return status.HTTP_400_BAD_REQUEST
+    return status.HTTP_207_MULTI_STATUS
+
+
+class TitleBulkWriter(BulkWriter):
+    serializer_class = TitleBulkSerializer
+
+    def resolve_slugs(self, model, field, valid, errors):
+        """Один запрос slug__in на связь; неизвестные slug - ошибки."""
+        slugs = set()
+        for data in valid.values():
+            value = data.get(field)
+            if value is not None:
+                slugs.update(value if isinstance(value, list) else (value,))
+        found = dict(model.objects.filter(slug__in=slugs).values_list(
+            'slug', 'pk')) if slugs else {}
+        for index, data in valid.items():
+            value = data.get(field)
+            if value is None:
+                continue
+            missing = [slug for slug in (
+                value if isinstance(value, list) else (value,))
+                if slug not in found]
+            if missing:
+                errors.setdefault(index, {})[field] = [
+                    does_not_exist(slug) for slug in missing]
+            elif isinstance(value, list):
+                data[field] = list(dict.fromkeys(
+                    found[slug] for slug in value))
+            else:
+                data[field] = found[value]
+
+    def resolve(self, valid, errors):
+        self.resolve_slugs(Genre, 'genre', valid, errors)
+        self.resolve_slugs(Category, 'category', valid, errors)
+
+    def create_titles(self, titles):
+        """bulk_create с id новых строк и там, где база их не возвращает.
+
+        Тогда новые строки ищутся после наибольшего id до вставки и
+        сопоставляются произведениям пакета по значениям полей в порядке
+        вставки: строки других транзакций с иными значениями
+        пропускаются.
+        """
+        features = connections[router.db_for_write(Title)].features
+        if features.can_return_ids_from_bulk_insert:
+            Title.objects.bulk_create(titles, batch_size=BATCH_SIZE)
+            return
+        last = Title.objects.aggregate(last=Max('pk'))['last'] or 0
+        Title.objects.bulk_create(titles, batch_size=BATCH_SIZE)
+        rows = iter(Title.objects.filter(pk__gt=last).order_by(
+            'pk').values_list('pk', *TITLE_KEY))
+        for title in titles:
+            key = tuple(getattr(title, field) for field in TITLE_KEY)
+            for pk, *values in rows:
+                if tuple(values) == key:
+                    title.pk = pk
+                    break
+            else:
+                raise IntegrityError('Не найдены id новых произведений')
+
+    def write(self, valid):
+        titles = [Title(name=data['name'], year=data['year'],
+                        description=data.get('description', ''),
+                        category_id=data['category'])
+                  for data in valid.values()]
+        self.create_titles(titles)
+        TitleGenre.objects.bulk_create(
+            (TitleGenre(title_id=title.pk, genre_id=genre_id)
+             for title, data in zip(titles, valid.values())
+             for genre_id in data['genre']),
+            batch_size=BATCH_SIZE)
+        ChangeEvent.objects.log_many('title', CHANGE_CREATED,
+                                     (title.pk for title in titles))
+        self.titles = titles
+        return {index: {'id': title.pk}
+                for index, title in zip(valid, titles)}
+
+    def written(self, valid, written):
+        TableVersion.objects.bump(TITLE_STAMP)
+        cache.invalidate(cache.TITLES, cache.TITLE_FACETS)
+        get_backend().index_many('title', (
+            (title.pk, title_document(title)) for title in self.titles))
+
+
+class TitleBulkUpdateWriter(TitleBulkWriter):
+    serializer_class = TitleBulkUpdateSerializer
+    partial = True
+    success_status = status.HTTP_200_OK
+    success_key = 'updated'
+
+    def resolve(self, valid, errors):
+        seen = set()
+        for index, data in valid.items():
+            if data['id'] in seen:
+                errors[index] = {'id': error(
+                    'Произведение уже изменяется в этом пакете')}
+            seen.add(data['id'])
+        self.titles = Title.objects.in_bulk(seen)
+        for index, data in valid.items():
+            if index not in errors and data['id'] not in self.titles:
+                errors[index] = {'id': error(
+                    f'Произведение {data["id"]} не найдено',
+                    code='not_found')}
+        super().resolve(valid, errors)
+
+    def write(self, valid):
+        fields = set()
+        genres = {}
+        rated = set()
+        for data in valid.values():
+            title = self.titles[data['id']]
+            for field in ('name', 'year', 'description'):
+                if field in data:
+                    setattr(title, field, data[field])
+                    fields.add(field)
+            if ('category' in data
+                    and data['category'] != title.category_id):
+                title.category_id = data['category']
+                fields.add('category')
+                rated.add(title.pk)
+            if 'genre' in data:
+                genres[title.pk] = data['genre']
+        updated = [self.titles[data['id']] for data in valid.values()]
+        # bulk_update не заполняет auto_now, а смена жанров - тоже
+        # изменение произведения для выгрузки по updated_since.
+        now = timezone.now()
+        for title in updated:
+            title.updated = now
+        Title.objects.bulk_update(updated, fields | {'updated'},
+                                  batch_size=BATCH_SIZE)
+        rated |= TitleGenre.objects.replace(genres)
+        ChangeEvent.objects.log_many('title', CHANGE_UPDATED,
+                                     (title.pk for title in updated))
+        # Рейтинги пересчитываются только для произведений с отзывами,
+        # у которых сменились категория или жанры.
+        self.refresh = [title.pk for title in updated
+                        if title.pk in rated and title.rating_count]
+        self.titles = updated
+        return {index: {'id': data['id']} for index, data in valid.items()}
+
+    def written(self, valid, written):
+        TableVersion.objects.bump(TITLE_STAMP)
+        cache.invalidate(cache.TITLES, cache.TITLE_FACETS,
+                         cache.TITLE_DETAILS)
+        get_backend().index_many('title', (
+            (title.pk, title_document(title)) for title in self.titles))
+        for title_id in self.refresh:
+            schedule_refresh(title_id)
+
+
+class DictionaryBulkWriter(BulkWriter):
+    """Жанры и категории: поиск занятых slug одним запросом."""
+    stamp = None
+    cache_group = None
+    fragments = None
+
+    def get_child(self):
+        child = super().get_child()
+        # Уникальность slug проверяется в resolve() для всего пакета.
+        child.fields['slug'].validators = [
+            validator for validator in child.fields['slug'].validators
+            if not isinstance(validator, UniqueValidator)]
+        return child
+
+    @property
+    def model(self):
+        return self.serializer_class.Meta.model
+
+    def duplicates(self, valid, errors):
+        seen = set()
+        for index, data in valid.items():
+            if data['slug'] in seen:
+                errors[index] = {'slug': error(
+                    'Slug повторяется в этом пакете', code='unique')}
+            seen.add(data['slug'])
+        return dict(self.model.objects.filter(slug__in=seen).values_list(
+            'slug', 'pk'))
+
+    def resolve(self, valid, errors):
+        existing = self.duplicates(valid, errors)
+        for index, data in valid.items():
+            if index not in errors and data['slug'] in existing:
+                errors[index] = {'slug': error(
+                    f'{self.model._meta.verbose_name} с таким slug '
+                    'уже существует', code='unique')}
+
+    def write(self, valid):
+        self.model.objects.bulk_create(
+            (self.model(**data) for data in valid.values()),
+            batch_size=BATCH_SIZE)
+        return {index: {'slug': data['slug']}
+                for index, data in valid.items()}
+
+    def written(self, valid, written):
+        # Жанры и категории встроены в ответы по произведениям. Другие
+        # процессы сбросят кэш фрагментов по версии таблицы.
+        self.fragments.clear()
+        TableVersion.objects.bump(self.stamp, TITLE_STAMP)
+        cache.invalidate(self.cache_group, cache.TITLES, cache.TITLE_FACETS,
+                         cache.TITLE_DETAILS)
+
+
+class DictionaryBulkUpdateWriter(DictionaryBulkWriter):
+    """Переименование по slug: slug определяет объект и не меняется."""
+    partial = True
+    success_status = status.HTTP_200_OK
+    success_key = 'updated'
+
+    def validate(self, items):
+        valid, errors = super().validate(items)
+        for index, data in list(valid.items()):
+            if 'slug' not in data:
+                errors[index] = {'slug': error('Обязательное поле.',
+                                               code='required')}
+                del valid[index]
+        return valid, errors
+
+    def resolve(self, valid, errors):
+        self.existing = self.duplicates(valid, errors)
+        for index, data in valid.items():
+            if index not in errors and data['slug'] not in self.existing:
+                errors[index] = {'slug': [does_not_exist(data['slug'])]}
+
+    def write(self, valid):
+        objects = [self.model(pk=self.existing[data['slug']], **data)
+                   for data in valid.values() if 'name' in data]
+        if objects:
+            self.model.objects.bulk_update(objects, ('name',),
+                                           batch_size=BATCH_SIZE)
+        return {index: {'slug': data['slug']}
+                for index, data in valid.items()}
+
+
+class GenreBulkWriter(DictionaryBulkWriter):
+    serializer_class = GenreSerializer
+    stamp = GENRE_STAMP
+    cache_group = cache.GENRES
+    fragments = genre_fragments
+
+
+class GenreBulkUpdateWriter(DictionaryBulkUpdateWriter, GenreBulkWriter):
+    pass
+
+
+class CategoryBulkWriter(DictionaryBulkWriter):
+    serializer_class = CategorySerializer
+    stamp = CATEGORY_STAMP
+    cache_group = cache.CATEGORIES
+    fragments = category_fragments
+
+
+class CategoryBulkUpdateWriter(DictionaryBulkUpdateWriter,
+                               CategoryBulkWriter):
+    pass
@@ -0,0 +1,94 @@
+"""Кэш ответов для анонимных GET-запросов.
+
+Ключ ответа включает номера поколений групп, от которых он зависит.
+Инвалидация увеличивает поколение группы, и все её старые ключи
+перестают находиться, не требуя удаления по шаблону.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+TITLES = 'titles'
+TITLE_DETAILS = 'title_details'
+TITLE_FACETS = 'title_facets'
+GENRES = 'genres'
+CATEGORIES = 'categories'
+
+
+def title_group(title_id):
+    return f'title:{title_id}'
+
+
+def reviews_group(title_id):
+    return f'reviews:{title_id}'
+
+
+def comments_group(review_id):
+    return f'comments:{review_id}'
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def generation_key(group):
+    return f'generation:{group}'
+
+
+def get_generations(groups):
+    cache = response_cache()
+    keys = [generation_key(group) for group in groups]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # Начальное значение от времени, чтобы после вытеснения
+            # счётчика старые ключи не совпали с новыми.
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate(*groups):
+    """Сдвигает поколения после фиксации текущей транзакции.
+
+    Иначе анонимный запрос между инвалидацией и фиксацией прочитал бы
+    старые строки и сохранил их под новым поколением.
+    """
+    transaction.on_commit(partial(bump_generations, groups))
+
+
+def bump_generations(groups):
+    cache = response_cache()
+    for group in groups:
+        try:
+            cache.incr(generation_key(group))
+        except ValueError:
+            cache.set(generation_key(group), time.time_ns(), None)
+
+
+def normalize_query(query_params):
+    return urlencode(sorted(
+        (key, value)
+        for key in query_params
+        for value in sorted(query_params.getlist(key))
+    ))
+
+
+def response_key(request, groups):
+    authenticator = type(request.successful_authenticator).__name__
+    # Хост и схема входят в ключ: ссылки next/previous абсолютные.
+    parts = (
+        request.scheme,
+        request.get_host(),
+        request.path,
+        normalize_query(request.query_params),
+        authenticator,
+        request.accepted_media_type,
+        ':'.join(str(generation) for generation in get_generations(groups)),
+    )
+    return 'response:' + hashlib.md5('|'.join(parts).encode()).hexdigest()
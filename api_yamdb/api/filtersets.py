@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
 from django_filters import CharFilter, FilterSet
+from rest_framework.filters import BaseFilterBackend
 from reviews.models import Title
+from search.backends import get_backend
 
 
 class TitleFilter(FilterSet):
@@ -10,3 +14,29 @@ class TitleFilter(FilterSet):
     class Meta:
         model = Title
         fields = ('category', 'genres', 'name', 'year')
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """Поиск ?q= по полнотекстовому индексу с сортировкой по релевантности.
+
+    Вью задаёт search_kind и, для вложенных ресурсов,
+    search_parent_kwarg - имя kwarg с id родителя.
+    """
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        parent_kwarg = getattr(view, 'search_parent_kwarg', None)
+        ids = get_backend().search(
+            view.search_kind, query,
+            parent_id=view.kwargs.get(parent_kwarg) if parent_kwarg else None,
+            limit=settings.SEARCH_MAX_RESULTS)
+        if not ids:
+            return queryset.none()
+        relevance = Case(
+            *(When(pk=pk, then=Value(position))
+              for position, pk in enumerate(ids)),
+            output_field=IntegerField())
+        return queryset.filter(pk__in=ids).order_by(relevance)
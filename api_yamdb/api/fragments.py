@@ -0,0 +1,88 @@
+import threading
+
+from django.db.models.signals import post_delete, post_save
+from rest_framework import serializers
+from reviews.models import TableVersion
+
+
+class FragmentCache:
+    """Процессный кэш сериализованных объектов по pk.
+
+    Сохранение и удаление модели в этом процессе сбрасывает кэш сразу.
+    Изменения из других процессов видны через версию таблицы в
+    TableVersion: каждый сериализатор читает её при создании и передаёт
+    в get(). Кэш хранит фрагменты только самой новой из увиденных
+    версий, поэтому запрос со старой версией не сбросит и не испортит
+    его из соседнего потока.
+    """
+
+    def __init__(self, serializer_class, version_stamp):
+        self.serializer_class = serializer_class
+        self.version_stamp = version_stamp
+        self.version = None
+        self.fragments = {}
+        self.lock = threading.Lock()
+        model = serializer_class.Meta.model
+        post_save.connect(self.clear, sender=model, weak=False)
+        post_delete.connect(self.clear, sender=model, weak=False)
+
+    def __deepcopy__(self, memo):
+        # DRF копирует аргументы полей для каждого сериализатора,
+        # а кэш должен оставаться общим.
+        return self
+
+    def clear(self, **kwargs):
+        with self.lock:
+            self.fragments = {}
+
+    def get(self, obj, version):
+        with self.lock:
+            if version == self.version:
+                fragment = self.fragments.get(obj.pk)
+                if fragment is not None:
+                    return fragment
+        fragment = dict(self.serializer_class(obj).data)
+        with self.lock:
+            if self.version is None or version > self.version:
+                self.fragments = {}
+                self.version = version
+            if version == self.version:
+                self.fragments[obj.pk] = fragment
+        return fragment
+
+
+def fragment_versions(*caches, versions=None):
+    """Версии таблиц, по которым сериализатор читает кэши.
+
+    versions - уже прочитанные версии, например те, по которым построен
+    ETag ответа; иначе они читаются одним запросом.
+    """
+    if versions is None:
+        versions = dict(TableVersion.objects.filter(
+            name__in=[cache.version_stamp for cache in caches]
+        ).values_list('name', 'version'))
+    return {cache.version_stamp: versions.get(cache.version_stamp, 0)
+            for cache in caches}
+
+
+class FragmentField(serializers.Field):
+    """Готовый словарь из FragmentCache вместо вложенного сериализатора."""
+
+    def __init__(self, fragments, **kwargs):
+        self.fragments = fragments
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    @property
+    def version(self):
+        return self.parent.fragment_versions[self.fragments.version_stamp]
+
+    def to_representation(self, value):
+        return self.fragments.get(value, self.version)
+
+
+class FragmentListField(FragmentField):
+
+    def to_representation(self, value):
+        version = self.version
+        return [self.fragments.get(obj, version) for obj in value.all()]
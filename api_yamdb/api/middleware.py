@@ -0,0 +1,135 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from api.authentication import StatelessJWTAuthentication
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger('api.query_budget')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы и время в базе на каждый запрос.
+
+    Итог отдаётся в заголовке Server-Timing. Если представление объявило
+    бюджет (см. QueryBudgetMixin) и запрос его превысил, пишется
+    предупреждение, а при QUERY_BUDGET_STRICT выбрасывается исключение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = (
+            f'db;dur={counter.duration * 1000:.2f};'
+            f'desc="{counter.count} queries", '
+            f'app;dur={total * 1000:.2f}')
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and counter.count > budget.limit:
+            self.exceeded(request, budget, counter.count)
+        return response
+
+    def exceeded(self, request, budget, count):
+        message = (f'{budget.view} exceeded its query budget: '
+                   f'{count} > {budget.limit} '
+                   f'({request.method} {request.get_full_path()})')
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def is_admin_request(request):
+    """Проверка токена администратора до того, как запрос дойдёт до DRF."""
+    try:
+        result = StatelessJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return result is not None and result[0].is_admin
+
+
+class ProfilingMiddleware:
+    """Выборочное профилирование запросов через cProfile.
+
+    Профилируется доля PROFILING_SAMPLE_RATE запросов при включённом
+    PROFILING_ENABLED, а также запросы администраторов с заголовком
+    PROFILING_HEADER. Статистика копится по представлениям и после
+    каждого замера сбрасывается в PROFILING_DIR/<метод-представление>/
+    <pid>.prof; свести и вывести её можно командой profile_report.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def should_profile(self, request):
+        if (settings.PROFILING_ENABLED
+                and random.random() < settings.PROFILING_SAMPLE_RATE):
+            return True
+        header = settings.PROFILING_HEADER
+        return (header is not None
+                and request.headers.get(header) == '1'
+                and is_admin_request(request))
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        self.collect(request, profiler)
+        return response
+
+    def get_key(self, request):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        return re.sub(r'[^\w.-]', '_', f'{request.method}-{view}')
+
+    def collect(self, request, profiler):
+        key = self.get_key(request)
+        path = os.path.join(settings.PROFILING_DIR, key)
+        os.makedirs(path, exist_ok=True)
+        with self.lock:
+            stats, requests = self.stats.get(key, (None, 0))
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+            self.stats[key] = stats, requests + 1
+            stats.dump_stats(os.path.join(path, f'{os.getpid()}.prof'))
+            with open(os.path.join(path, f'{os.getpid()}.json'), 'w') as file:
+                json.dump({'requests': requests + 1}, file)
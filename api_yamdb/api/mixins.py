@@ -0,0 +1,198 @@
+import hashlib
+from collections import namedtuple
+from datetime import timedelta
+
+from api import cache
+from api.bulk import BulkConflict, check_items, response_status
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from reviews.models import TableVersion
+
+QueryBudget = namedtuple('QueryBudget', 'view limit')
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified по версии таблицы.
+
+    Валидаторы считаются по счётчику в TableVersion, поэтому при
+    совпадении If-None-Match ответ 304 отдаётся без обращения к queryset.
+    Счётчики related_stamps читаются тем же запросом и доступны
+    сериализатору в контексте как table_versions.
+    """
+    version_stamp = None
+    related_stamps = ()
+    table_versions = None
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.table_versions is not None:
+            context['table_versions'] = self.table_versions
+        return context
+
+    def get_validators(self, request):
+        stamp, self.table_versions = TableVersion.objects.get_stamps(
+            self.version_stamp, *self.related_stamps)
+        key = (f'{stamp.name}:{stamp.version}:{request.get_full_path()}:'
+               f'{request.accepted_media_type}')
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        # Last-Modified точен до секунды: пока версия моложе секунды,
+        # следующая запись получила бы ту же дату, и If-Modified-Since
+        # вернул бы 304 на изменённые данные. Тогда остаётся только ETag.
+        if timezone.now() - stamp.updated < timedelta(seconds=1):
+            return etag, None
+        return etag, int(stamp.updated.timestamp())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in {200, 304}:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class ConditionalListMixin(ConditionalGetMixin):
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class CachedResponseMixin:
+    """Кэширует ответы анонимным пользователям.
+
+    get_cache_groups() возвращает группы инвалидации, от которых
+    зависит ответ текущего запроса.
+    """
+    cache_groups = ()
+
+    def get_cache_groups(self):
+        return self.cache_groups
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        response_cache = cache.response_cache()
+        key = cache.response_key(request, self.get_cache_groups())
+        cached = response_cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: response_cache.set(
+                    key, (rendered.content, rendered['Content-Type']),
+                    settings.RESPONSE_CACHE_TIMEOUT))
+        return response
+
+
+class CachedListMixin(CachedResponseMixin):
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class NestedParentMixin:
+    """Родитель вложенного маршрута titles/{id}/reviews/{id}/...
+
+    parent_lookups сопоставляет kwargs маршрута полям родителя, поэтому
+    вся цепочка id проверяется одним запросом, а родитель кэшируется на
+    вью и переиспользуется при записи. child_lookups фильтрует дочерние
+    объекты по тем же kwargs: detail-запросы обходятся без загрузки
+    родителя, а несуществующая цепочка даёт 404 на самом объекте.
+    """
+    parent_model = None
+    parent_lookups = {}
+    child_lookups = {}
+
+    def get_parent(self):
+        if not hasattr(self, '_parent'):
+            self._parent = get_object_or_404(self.parent_model, **{
+                field: self.kwargs[kwarg]
+                for kwarg, field in self.parent_lookups.items()
+            })
+        return self._parent
+
+    def get_queryset(self):
+        if not self.detail:
+            # Список несуществующего родителя - это 404, а не пустой список.
+            self.get_parent()
+        return super().get_queryset().filter(**{
+            field: self.kwargs[kwarg]
+            for kwarg, field in self.child_lookups.items()
+        })
+
+
+class QueryBudgetMixin:
+    """Бюджет SQL-запросов представления для QueryBudgetMiddleware.
+
+    query_budget — число или словарь {действие: число}; действия без
+    бюджета не проверяются.
+    """
+    query_budget = None
+
+    def get_query_budget(self):
+        if isinstance(self.query_budget, dict):
+            return self.query_budget.get(getattr(self, 'action', None))
+        return self.query_budget
+
+    def initial(self, request, *args, **kwargs):
+        limit = self.get_query_budget()
+        if limit is not None:
+            name = type(self).__name__
+            action = getattr(self, 'action', None)
+            request._request.query_budget = QueryBudget(
+                f'{name}.{action}' if action else name, limit)
+        super().initial(request, *args, **kwargs)
+
+
+class BulkWriteMixin:
+    """POST и PATCH списка объектов на .../bulk/.
+
+    bulk_writers - классы писателей из api.bulk по методам запроса.
+    Корректные элементы записываются, даже если часть пакета не прошла
+    проверку: тогда ответ 207 с результатом по каждому элементу.
+    """
+    bulk_writers = {}
+
+    @action(detail=False, methods=('post', 'patch'), url_path='bulk')
+    def bulk(self, request):
+        check_items(request.data)
+        writer = self.bulk_writers[request.method](
+            self.get_serializer_context())
+        try:
+            written, failed, results = writer.results(request.data)
+        except BulkConflict as e:
+            return Response(
+                {'detail': f'Пакет не записан: {e}'},
+                status=status.HTTP_409_CONFLICT)
+        return Response(
+            {writer.success_key: written, 'failed': failed,
+             'results': results},
+            status=response_status(writer, written, failed))
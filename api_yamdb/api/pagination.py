@@ -0,0 +1,40 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class FeedCursorPagination(CursorPagination):
+    ordering = ('-pub_date', '-id')
+
+
+class RankingPagination(CursorPagination):
+    ordering = ('-score', 'title_id')
+
+
+class FeedPagination(PageNumberPagination):
+    """Для review/comment.
+
+    По умолчанию постраничная пагинация. Курсорный режим без COUNT и OFFSET
+    включается параметром ?pagination=cursor, дальше клиент следует по
+    ссылкам next/previous с непрозрачным ?cursor=.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.cursor_paginator = FeedCursorPagination()
+        self.use_cursor = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            self.cursor_paginator.cursor_query_param in request.query_params
+            or request.query_params.get(
+                self.mode_query_param) == self.cursor_mode
+        )
+        if self.use_cursor:
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.use_cursor:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
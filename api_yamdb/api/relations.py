@@ -0,0 +1,47 @@
+from django.utils.encoding import smart_str
+from rest_framework import serializers
+from rest_framework.relations import (MANY_RELATION_KWARGS, ManyRelatedField,
+                                      SlugRelatedField)
+
+
+class ManySlugRelatedField(ManyRelatedField):
+    """Список slug разрешается одним запросом slug__in.
+
+    ManyRelatedField вызывает queryset.get() для каждого элемента и
+    останавливается на первом неизвестном slug. Здесь запрос один, а в
+    ошибке перечислены все неизвестные slug. Повторы отбрасываются.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        if not all(isinstance(slug, (str, int)) for slug in data):
+            child.fail('invalid')
+        slugs = list(dict.fromkeys(smart_str(slug) for slug in data))
+        found = {
+            smart_str(getattr(obj, child.slug_field)): obj
+            for obj in child.get_queryset().filter(
+                **{f'{child.slug_field}__in': slugs})
+        }
+        missing = [slug for slug in slugs if slug not in found]
+        if missing:
+            message = child.error_messages['does_not_exist']
+            raise serializers.ValidationError([
+                message.format(slug_name=child.slug_field, value=slug)
+                for slug in missing])
+        return [found[slug] for slug in slugs]
+
+
+class BatchedSlugRelatedField(SlugRelatedField):
+    """SlugRelatedField, у которого many=True даёт ManySlugRelatedField."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return ManySlugRelatedField(**list_kwargs)
@@ -1,6 +1,13 @@
+from api.fragments import (FragmentCache, FragmentField, FragmentListField,
+                           fragment_versions)
+from api.relations import BatchedSlugRelatedField
+from django.db import IntegrityError, transaction
 from rest_framework import exceptions, serializers
 from rest_framework.relations import SlugRelatedField
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from rest_framework.settings import api_settings
+from reviews.models import (CATEGORY_STAMP, GENRE_STAMP, Category, Comment,
+                            Genre, Review, Title, TitleGenre, TitleRanking,
+                            User)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -15,10 +22,20 @@ class GenreSerializer(serializers.ModelSerializer):
         fields = ('name', 'slug')
 
 
+genre_fragments = FragmentCache(GenreSerializer, GENRE_STAMP)
+category_fragments = FragmentCache(CategorySerializer, CATEGORY_STAMP)
+
+
 class TitleReadSerializer(serializers.ModelSerializer):
+    """Жанры и категории берутся из кэша готовых словарей.
+
+    Кэш сверяется с версиями таблиц один раз при создании сериализатора
+    (для many=True - один раз на весь список): по table_versions из
+    контекста, с которыми построен ETag ответа, или отдельным запросом.
+    """
     rating = serializers.IntegerField(read_only=True)
-    genre = GenreSerializer(read_only=True, many=True, source='genres')
-    category = CategorySerializer(read_only=True)
+    genre = FragmentListField(genre_fragments, source='genres')
+    category = FragmentField(category_fragments)
 
     class Meta:
         fields = (
@@ -27,10 +44,36 @@ class TitleReadSerializer(serializers.ModelSerializer):
         read_only_fields = ('name', 'year', 'description')
         model = Title
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragment_versions = fragment_versions(
+            genre_fragments, category_fragments,
+            versions=self.context.get('table_versions'))
+
+
+class TitleRankingSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        fields = ('score', 'title')
+        model = TitleRanking
+
+    def get_fields(self):
+        # Вложенный сериализатор создаётся лениво: при объявлении на
+        # уровне класса он сверял бы кэш фрагментов с базой при импорте.
+        fields = super().get_fields()
+        fields['title'] = TitleReadSerializer(read_only=True)
+        return fields
+
 
 class TitleCreateUpdateDestroySerializer(serializers.ModelSerializer):
-    genre = SlugRelatedField(many=True, source='genres', slug_field='slug',
-                             queryset=Genre.objects.all())
+    """Жанры пишутся разницей через TitleGenre.objects.replace.
+
+    Версия таблицы, кэш и рейтинги обновляются сигналами сохранения
+    произведения, поэтому m2m_changed для жанров не нужен.
+    """
+    genre = BatchedSlugRelatedField(many=True, source='genres',
+                                    slug_field='slug',
+                                    queryset=Genre.objects.all())
     category = SlugRelatedField(slug_field='slug',
                                 queryset=Category.objects.all())
 
@@ -40,6 +83,48 @@ class TitleCreateUpdateDestroySerializer(serializers.ModelSerializer):
         )
         model = Title
 
+    def create(self, validated_data):
+        genres = validated_data.pop('genres')
+        title = super().create(validated_data)
+        TitleGenre.objects.replace({title.pk: [genre.pk for genre in genres]})
+        return title
+
+    def update(self, instance, validated_data):
+        genres = validated_data.pop('genres', None)
+        title = super().update(instance, validated_data)
+        if genres is not None:
+            TitleGenre.objects.replace(
+                {title.pk: [genre.pk for genre in genres]})
+        return title
+
+
+class TitleBulkSerializer(serializers.ModelSerializer):
+    """Поля как у TitleCreateUpdateDestroySerializer, но slug без запросов.
+
+    Slug разрешаются в id писателем пакета.
+    """
+    genre = serializers.ListField(child=serializers.SlugField(),
+                                  allow_empty=False)
+    category = serializers.SlugField()
+
+    class Meta:
+        fields = ('name', 'year', 'description', 'genre', 'category')
+        model = Title
+
+
+class TitleBulkUpdateSerializer(TitleBulkSerializer):
+    id = serializers.IntegerField()
+
+    class Meta(TitleBulkSerializer.Meta):
+        fields = ('id',) + TitleBulkSerializer.Meta.fields
+
+    def run_validation(self, data=serializers.empty):
+        # id нужен для поиска произведения и при частичном обновлении.
+        if isinstance(data, dict) and 'id' not in data:
+            raise serializers.ValidationError(
+                {'id': [self.fields['id'].error_messages['required']]})
+        return super().run_validation(data)
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     author = SlugRelatedField(slug_field='username', read_only=True,
@@ -49,15 +134,21 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ('id', 'text', 'author', 'score', 'pub_date')
         model = Review
 
-    def validate(self, attrs):
-        if self.context.get('request').method != 'POST':
-            return attrs
-        author = self.context.get('request').user
-        title_id = self.context.get('view').kwargs.get('titles_id')
-        if Review.objects.filter(title__id=title_id, author=author).exists():
-            raise serializers.ValidationError(
-                'На каждое произведение можно оставить только одно ревью')
-        return attrs
+    def create(self, validated_data):
+        # Уникальность гарантирует ограничение unique_title_author:
+        # вставляем сразу, а повтор узнаём по ошибке базы.
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            if not Review.objects.filter(
+                    title=validated_data['title'],
+                    author=validated_data['author']).exists():
+                raise
+        raise serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: [
+                'На каждое произведение можно оставить только одно ревью'],
+        })
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -0,0 +1,76 @@
+from functools import partial
+
+from api import cache
+from api.authentication import forget_token_version
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleGenre, User)
+
+
+@receiver((post_save, post_delete), sender=Title)
+def title_changed(sender, instance, signal, **kwargs):
+    groups = [cache.TITLES, cache.TITLE_FACETS, cache.title_group(instance.pk)]
+    if signal is post_delete:
+        groups.append(cache.reviews_group(instance.pk))
+    cache.invalidate(*groups)
+
+
+@receiver((post_save, post_delete), sender=TitleGenre)
+def title_genre_changed(sender, instance, **kwargs):
+    cache.invalidate(cache.TITLES, cache.TITLE_FACETS,
+                     cache.title_group(instance.title_id))
+
+
+@receiver(m2m_changed, sender=TitleGenre)
+def title_genres_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        cache.invalidate(cache.TITLES, cache.TITLE_FACETS,
+                         cache.TITLE_DETAILS)
+    else:
+        cache.invalidate(cache.TITLES, cache.TITLE_FACETS,
+                         cache.title_group(instance.pk))
+
+
+@receiver((post_save, post_delete), sender=Genre)
+def genre_changed(sender, **kwargs):
+    cache.invalidate(cache.GENRES, cache.TITLES, cache.TITLE_FACETS,
+                     cache.TITLE_DETAILS)
+
+
+@receiver((post_save, post_delete), sender=Category)
+def category_changed(sender, **kwargs):
+    cache.invalidate(cache.CATEGORIES, cache.TITLES, cache.TITLE_FACETS,
+                     cache.TITLE_DETAILS)
+
+
+@receiver((post_save, post_delete), sender=Review)
+def review_changed(sender, instance, signal, **kwargs):
+    groups = [
+        cache.TITLES,
+        cache.title_group(instance.title_id),
+        cache.reviews_group(instance.title_id),
+    ]
+    if signal is post_delete:
+        groups.append(cache.comments_group(instance.pk))
+    cache.invalidate(*groups)
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    cache.invalidate(cache.comments_group(instance.review_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    if getattr(instance, '_tokens_revoked', False):
+        transaction.on_commit(partial(forget_token_version, instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # Версия удалённого пользователя не найдётся, и его токены отвергнутся.
+    transaction.on_commit(partial(forget_token_version, instance.pk))
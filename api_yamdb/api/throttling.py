@@ -0,0 +1,148 @@
+"""Ограничение частоты запросов ведром токенов в общем кэше.
+
+Ведро хранится одним числом - теоретическим временем прихода
+следующего запроса (GCRA, эквивалент ведра токенов): каждый запрос
+сдвигает его на интервал между токенами атомарным cache.incr, и запрос
+разрешён, пока это время опережает текущее не больше, чем на полное
+ведро. Поэтому лимиты соблюдаются всеми процессами, если кэш общий и
+incr в нём атомарен (memcached, Redis); LocMemCache атомарен только
+внутри процесса.
+
+Ставка в DEFAULT_THROTTLE_RATES - 'N/период': ведро на N запросов,
+которое заполняется целиком за период. Ставка None отключает
+ограничение области.
+"""
+import hashlib
+import math
+import time
+from contextlib import suppress
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+from reviews.models import ADMIN, MODERATOR, USER
+
+
+def consume(cache, key, capacity, period):
+    """Берёт токен из ведра; возвращает 0 или секунды до нового токена."""
+    interval = max(1, int(period * 1000 / capacity))
+    burst = interval * capacity
+    timeout = math.ceil(period) + 1
+    now = int(time.time() * 1000)
+    if cache.add(key, now + interval, timeout):
+        return 0
+    try:
+        arrival = cache.incr(key, interval)
+    except ValueError:
+        # Ключ истёк между add и incr: ведро снова полное.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if arrival - interval < now:
+        # Время прихода в прошлом - ведро успело заполниться.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if arrival - now > burst:
+        # Отклонённый запрос токен не расходует.
+        with suppress(ValueError):
+            cache.decr(key, interval)
+        return (arrival - now - burst) / 1000
+    cache.touch(key, timeout)
+    return 0
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Область задаёт get_scope(), ведро - get_cache_key()."""
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        # Область известна только по запросу, как в ScopedRateThrottle.
+        self.delay = 0
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_rate(self):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        if self.scope not in rates:
+            raise ImproperlyConfigured(
+                f'No throttle rate set for "{self.scope}" scope')
+        return rates[self.scope]
+
+    def key(self, ident):
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        if self.scope is None:
+            return True
+        rate = self.get_rate()
+        if rate is None:
+            return True
+        capacity, period = self.parse_rate(rate)
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        self.delay = consume(self.cache, key, capacity, period)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Все запросы с одного адреса, в том числе с разных учётных записей."""
+    scope = 'ip'
+
+    def get_cache_key(self, request, view):
+        return self.key(self.get_ident(request))
+
+
+class RoleThrottle(TokenBucketThrottle):
+    """Пользователь - по id с бюджетом своей роли, аноним - по адресу."""
+
+    def get_scope(self, request, view):
+        user = request.user
+        if not user.is_authenticated:
+            return 'anon'
+        if user.is_admin:
+            return ADMIN
+        return MODERATOR if user.role == MODERATOR else USER
+
+    def get_cache_key(self, request, view):
+        user = request.user
+        return self.key(
+            user.pk if user.is_authenticated else self.get_ident(request))
+
+
+class WriteThrottle(RoleThrottle):
+    """Отдельный, меньший бюджет на изменяющие запросы."""
+
+    def get_scope(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return f'{super().get_scope(request, view)}_write'
+
+
+class AuthThrottle(IPThrottle):
+    """Регистрация и выдача токена с одного адреса."""
+    scope = 'auth'
+
+
+class AuthIdentityThrottle(TokenBucketThrottle):
+    """Подбор кода и рассылка писем одному имени с разных адресов."""
+    scope = 'auth_identity'
+
+    def get_cache_key(self, request, view):
+        username = (request.data.get('username')
+                    if hasattr(request.data, 'get') else None)
+        if not isinstance(username, str) or not username:
+            return None
+        return self.key(
+            hashlib.sha256(username.lower().encode()).hexdigest())
@@ -1,5 +1,6 @@
-from api.views import (AuthClass, CategoryViewSet, CommentViewSet,
-                       GenreViewSet, ReviewViewSet, TitleViewSet, UserViewSet)
+from api.views import (AuthClass, CategoryViewSet, ChangesViewSet,
+                       CommentViewSet, ExportViewSet, GenreViewSet,
+                       ReviewViewSet, TitleViewSet, UserViewSet)
 from django.urls import include, path
 from rest_framework import routers
 
@@ -20,6 +21,8 @@ router_v1.register(
 )
 router_v1.register('titles', TitleViewSet, basename='titles')
 router_v1.register('users', UserViewSet, basename='users')
+router_v1.register('export', ExportViewSet, basename='export')
+router_v1.register('changes', ChangesViewSet, basename='changes')
 
 
 urlpatterns = [
@@ -1,17 +1,23 @@
-from api.filtersets import TitleFilter
+from api import bulk, cache
+from api.authentication import get_access_token
+from api.filtersets import FullTextSearchFilter, TitleFilter
+from api.mixins import (BulkWriteMixin, CachedListMixin, CachedRetrieveMixin,
+                        ConditionalListMixin, ConditionalRetrieveMixin,
+                        NestedParentMixin, QueryBudgetMixin)
+from api.pagination import FeedPagination, RankingPagination
 from api.permissions import (AdminPermissions, AllWithoutGuestOrReadOnly,
                              IsAdminOrReadOnly)
 from api.serializers import (CategorySerializer, CommentSerializer,
                              GenreSerializer, ReviewSerializer,
                              SignUpSerializer,
                              TitleCreateUpdateDestroySerializer,
-                             TitleReadSerializer, TokenSerializer,
-                             UserSerializer)
+                             TitleRankingSerializer, TitleReadSerializer,
+                             TokenSerializer, UserSerializer)
+from api.throttling import AuthIdentityThrottle, AuthThrottle, IPThrottle
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.db import IntegrityError
-from django.db.models import Avg
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, status, viewsets
@@ -19,24 +25,34 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import MethodNotAllowed, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import AccessToken
-from reviews.models import Category, Genre, Review, Title, User
+from reviews import changes
+from reviews.export import EXPORTS, FORMATS, export, parse_since
+from reviews.models import (CATEGORY_STAMP, GENRE_STAMP, GLOBAL_SCOPE,
+                            TITLE_STAMP, Category, Comment, Genre,
+                            QueuedEmail, Review, Title, TitleRanking, User)
+from reviews.rankings import category_scope, genre_scope
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(QueryBudgetMixin, CachedListMixin, NestedParentMixin,
+                    viewsets.ModelViewSet):
+    queryset = Review.objects.select_related('author')
+    query_budget = {'list': 4, 'retrieve': 2, 'create': 15,
+                    'partial_update': 14}
     serializer_class = ReviewSerializer
     permission_classes = (AllWithoutGuestOrReadOnly, )
+    pagination_class = FeedPagination
+    filter_backends = (FullTextSearchFilter,)
+    search_kind = 'review'
+    search_parent_kwarg = 'titles_id'
+    parent_model = Title
+    parent_lookups = {'titles_id': 'pk'}
+    child_lookups = {'titles_id': 'title_id'}
 
-    def get_queryset(self):
-        title_id = self.kwargs.get('titles_id')
-        title = get_object_or_404(Title, id=title_id)
-        return title.reviews.all()
+    def get_cache_groups(self):
+        return (cache.reviews_group(self.kwargs.get('titles_id')),)
 
     def perform_create(self, serializer):
-        title_id = self.kwargs.get('titles_id')
-        title = get_object_or_404(Title, id=title_id)
-        serializer.save(author=self.request.user,
-                        title=title)
+        serializer.save(author=self.request.user, title=self.get_parent())
 
     def update(self, request, *args, **kwargs):
         if self.action == 'update':
@@ -44,20 +60,23 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return super().update(request, *args, **kwargs)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(QueryBudgetMixin, CachedListMixin, NestedParentMixin,
+                     viewsets.ModelViewSet):
+    queryset = Comment.objects.select_related('author')
+    query_budget = {'list': 4, 'retrieve': 2, 'create': 6,
+                    'partial_update': 6}
     serializer_class = CommentSerializer
     permission_classes = (AllWithoutGuestOrReadOnly, )
+    pagination_class = FeedPagination
+    parent_model = Review
+    parent_lookups = {'review_id': 'pk', 'titles_id': 'title_id'}
+    child_lookups = {'review_id': 'review_id', 'titles_id': 'review__title_id'}
 
-    def get_queryset(self):
-        review_id = self.kwargs.get('review_id')
-        review = get_object_or_404(Review, id=review_id)
-        return review.comments.all()
+    def get_cache_groups(self):
+        return (cache.comments_group(self.kwargs.get('review_id')),)
 
     def perform_create(self, serializer):
-        title_id = self.kwargs.get('titles_id')
-        review_id = self.kwargs.get('review_id')
-        review = get_object_or_404(Review, id=review_id, title__id=title_id)
-        serializer.save(author=self.request.user, review=review)
+        serializer.save(author=self.request.user, review=self.get_parent())
 
     def update(self, request, *args, **kwargs):
         if self.action == 'update':
@@ -65,56 +84,211 @@ class CommentViewSet(viewsets.ModelViewSet):
         return super().update(request, *args, **kwargs)
 
 
-class ListCreateDestroyViewSet(mixins.ListModelMixin,
+class ListCreateDestroyViewSet(QueryBudgetMixin,
+                               BulkWriteMixin,
+                               ConditionalListMixin,
+                               CachedListMixin,
+                               mixins.ListModelMixin,
                                mixins.CreateModelMixin,
                                mixins.DestroyModelMixin,
                                viewsets.GenericViewSet):
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
+    query_budget = {'list': 4, 'create': 12}
 
 
 class CategoryViewSet(ListCreateDestroyViewSet):
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
+    version_stamp = CATEGORY_STAMP
+    cache_groups = (cache.CATEGORIES,)
+    bulk_writers = {'POST': bulk.CategoryBulkWriter,
+                    'PATCH': bulk.CategoryBulkUpdateWriter}
 
 
 class GenreViewSet(ListCreateDestroyViewSet):
     serializer_class = GenreSerializer
     queryset = Genre.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
+    version_stamp = GENRE_STAMP
+    cache_groups = (cache.GENRES,)
+    bulk_writers = {'POST': bulk.GenreBulkWriter,
+                    'PATCH': bulk.GenreBulkUpdateWriter}
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(rating=Avg('reviews__score'))
+class TitleViewSet(QueryBudgetMixin, BulkWriteMixin,
+                   ConditionalListMixin, ConditionalRetrieveMixin,
+                   CachedListMixin, CachedRetrieveMixin,
+                   viewsets.ModelViewSet):
+    queryset = Title.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    # В фасетах четыре агрегата, версии таблиц и поиск ?q= по индексу.
+    query_budget = {'list': 5, 'retrieve': 4, 'facets': 6, 'top': 5,
+                    'create': 12, 'partial_update': 20}
+    version_stamp = TITLE_STAMP
+    # Кэш жанров и категорий сверяется с теми же версиями, что и ETag.
+    related_stamps = (GENRE_STAMP, CATEGORY_STAMP)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter)
     filterset_class = TitleFilter
+    search_kind = 'title'
+    bulk_writers = {'POST': bulk.TitleBulkWriter,
+                    'PATCH': bulk.TitleBulkUpdateWriter}
 
     def update(self, request, *args, **kwargs):
         if self.action == 'update':
             raise MethodNotAllowed('PUT')
         return super().update(request, *args, **kwargs)
 
+    # Произведение и его жанры пишутся одной транзакцией, тогда
+    # рейтинги пересчитываются один раз после неё.
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in {'list', 'retrieve'}:
+            return queryset.with_relations()
+        return queryset
+
     def get_serializer_class(self):
         if self.action in {'list', 'retrieve'}:
             return TitleReadSerializer
         return TitleCreateUpdateDestroySerializer
 
+    def get_cache_groups(self):
+        if self.action == 'retrieve':
+            return (cache.TITLE_DETAILS,
+                    cache.title_group(self.kwargs.get('pk')))
+        if self.action == 'facets':
+            return (cache.TITLE_FACETS,)
+        return (cache.TITLES,)
+
+    @action(detail=False, methods=('get',), url_path='facets')
+    def facets(self, request):
+        """Счётчики по жанрам, категориям и годам с фильтрами списка."""
+        return self.conditional_response(self.cached_facets, request)
+
+    def cached_facets(self, request):
+        return self.cached_response(self.count_facets, request)
+
+    def count_facets(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(queryset.facets(), status=status.HTTP_200_OK)
+
+    def get_ranking_scope(self):
+        genre = self.request.query_params.get('genre')
+        category = self.request.query_params.get('category')
+        if genre and category:
+            raise ValidationError(
+                'Рейтинг строится либо по жанру, либо по категории')
+        if genre:
+            return genre_scope(get_object_or_404(Genre, slug=genre).pk)
+        if category:
+            return category_scope(
+                get_object_or_404(Category, slug=category).pk)
+        return GLOBAL_SCOPE
+
+    @action(detail=False, methods=('get',),
+            url_path=r'top/(?P<board>rated|discussed)',
+            pagination_class=RankingPagination)
+    def top(self, request, board):
+        """Материализованный рейтинг, ?genre= или ?category= по slug."""
+        queryset = TitleRanking.objects.filter(
+            board=board, scope=self.get_ranking_scope(),
+        ).select_related('title__category').prefetch_related('title__genres')
+        page = self.paginate_queryset(queryset)
+        serializer = TitleRankingSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
 
-def create_conf_code_and_send_email(user):
+class ExportViewSet(viewsets.ViewSet):
+    """Потоковая выгрузка вместо обхода всех страниц списков.
+
+    /export/titles/, /export/reviews/, /export/comments/ с параметрами
+    output=ndjson|csv и updated_since для инкрементальной выгрузки.
+    """
+    permission_classes = (AdminPermissions,)
+    lookup_value_regex = '|'.join(EXPORTS)
+
+    def get_updated_since(self):
+        value = self.request.query_params.get('updated_since')
+        if not value:
+            return None
+        try:
+            return parse_since(value)
+        except ValueError:
+            raise ValidationError({'updated_since': [
+                'Ожидается дата и время в формате ISO 8601']})
+
+    def retrieve(self, request, pk):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in FORMATS:
+            raise ValidationError({'output': [
+                f'Доступные форматы: {", ".join(FORMATS)}']})
+        _, content_type, extension = FORMATS[output]
+        response = StreamingHttpResponse(
+            export(pk, output, self.get_updated_since()),
+            content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="{pk}.{extension}"')
+        # Курсор ленты /changes/, с которого зеркало догоняет выгрузку.
+        response['X-Changes-Cursor'] = changes.latest_cursor()
+        return response
+
+
+class ChangesViewSet(QueryBudgetMixin, viewsets.ViewSet):
+    """Лента изменений произведений, отзывов и комментариев.
+
+    ?since=<курсор>&limit=<число событий>; в ответе события по
+    возрастанию курсора, следующий курсор и признак has_more.
+    """
+    permission_classes = (AdminPermissions,)
+    query_budget = {'list': 6}
+
+    def get_int_param(self, name, default, minimum, maximum=None):
+        value = self.request.query_params.get(name, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            value = None
+        if (value is None or value < minimum
+                or maximum is not None and value > maximum):
+            limits = f'от {minimum}' + (f' до {maximum}' if maximum else '')
+            raise ValidationError({name: [f'Ожидается целое число {limits}']})
+        return value
+
+    def list(self, request):
+        events, cursor, has_more = changes.read(
+            self.get_int_param('since', 0, 0),
+            self.get_int_param('limit', settings.CHANGE_FEED_LIMIT, 1,
+                               settings.CHANGE_FEED_MAX_LIMIT))
+        return Response(
+            {'events': events, 'cursor': cursor, 'has_more': has_more},
+            status=status.HTTP_200_OK)
+
+
+def create_conf_code_and_queue_email(user):
+    """Письмо отправит команда send_queued_emails."""
     confirmation_code = default_token_generator.make_token(user)
-    send_mail(
-        'Код подтверждения',
-        f'Ваш код подтверждения: {confirmation_code}',
-        settings.DEFAULT_FROM_EMAIL,
-        (user.email,)
+    QueuedEmail.objects.create(
+        subject='Код подтверждения',
+        body=f'Ваш код подтверждения: {confirmation_code}',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient=user.email,
     )
 
 
 class AuthClass(viewsets.ViewSet):
     """Класс авторизации пользователей."""
+    throttle_classes = (IPThrottle, AuthThrottle, AuthIdentityThrottle)
 
     @action(
         detail=False, methods=('post',),
@@ -128,7 +302,7 @@ class AuthClass(viewsets.ViewSet):
         except IntegrityError:
             raise ValidationError(
                 'Пользователь с такими данными уже существует')
-        create_conf_code_and_send_email(user)
+        create_conf_code_and_queue_email(user)
         return Response(
             serializer.data,
             status=status.HTTP_200_OK)
@@ -143,7 +317,7 @@ class AuthClass(viewsets.ViewSet):
         user = User.objects.get(username=serializer.data['username'])
         if default_token_generator.check_token(
            user, serializer.data['confirmation_code']):
-            token = AccessToken.for_user(user)
+            token = get_access_token(user)
             return Response(
                 {'token': str(token)}, status=status.HTTP_200_OK)
         return Response({
@@ -164,19 +338,25 @@ class UserViewSet(viewsets.ModelViewSet):
             raise MethodNotAllowed('PUT')
         return super().update(request, *args, **kwargs)
 
+    def get_me(self):
+        # Пользователь из токена содержит только поля claims.
+        if self.request.user.get_deferred_fields():
+            return get_object_or_404(User, pk=self.request.user.pk)
+        return self.request.user
+
     @action(
         detail=False, methods=('get',),
         url_path='me', url_name='me',
         permission_classes=(IsAuthenticated,),
     )
     def about_me(self, request):
-        serializer = self.get_serializer(request.user)
+        serializer = self.get_serializer(self.get_me())
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @about_me.mapping.patch
     def patch_about_me(self, request):
         serializer = self.get_serializer(
-            request.user, data=request.data, partial=True
+            self.get_me(), data=request.data, partial=True
         )
         serializer.is_valid(raise_exception=True)
         serializer.save(role=request.user.role)
@@ -26,9 +26,13 @@ INSTALLED_APPS = [
     'django_filters',
     'reviews.apps.ReviewsConfig',
     'api.apps.ApiConfig',
+    'search.apps.SearchConfig',
+    'bench.apps.BenchConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +70,7 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 
@@ -109,6 +114,22 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static/'),)
 
 AUTH_USER_MODEL = 'reviews.User'
 
+# В продакшене locmem заменяется общим для процессов бэкендом (Redis,
+# Memcached): на нём держатся версии токенов и кэш ответов API.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+# Полнотекстовый поиск: бэкенд (для PostgreSQL -
+# search.backends.PostgresSearchBackend), его языковая конфигурация
+# и предел числа найденных объектов
+SEARCH_BACKEND = 'search.backends.SQLiteFTS5Backend'
+SEARCH_CONFIG = 'russian'
+SEARCH_MAX_RESULTS = 1000
+
 PAGINATOR_PAGE_ITEMS_COUNT = 10
 
 REST_FRAMEWORK = {
@@ -117,21 +138,84 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': (
         'rest_framework.pagination.PageNumberPagination'),
     'PAGE_SIZE': PAGINATOR_PAGE_ITEMS_COUNT,
+
+    # Вёдра токенов api.throttling: по адресу, по пользователю с бюджетом
+    # роли и отдельно на запись; auth - регистрация и выдача токена.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.IPThrottle',
+        'api.throttling.RoleThrottle',
+        'api.throttling.WriteThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'ip': '1200/min',
+        'anon': '300/min',
+        'user': '600/min',
+        'moderator': '900/min',
+        'admin': '1200/min',
+        'anon_write': '30/min',
+        'user_write': '60/min',
+        'moderator_write': '120/min',
+        'admin_write': '300/min',
+        'auth': '20/hour',
+        'auth_identity': '5/hour',
+    },
+    # За сколькими прокси стоит приложение: адрес клиента для
+    # ограничений берётся из X-Forwarded-For
+    'NUM_PROXIES': None,
 }
+# Кэш с вёдрами токенов; для нескольких процессов - общий (memcached,
+# Redis) с атомарным incr
+THROTTLE_CACHE_ALIAS = 'default'
 
 SIMPLE_JWT = {
     # Устанавливаем срок жизни токена
     'ACCESS_TOKEN_LIFETIME': timedelta(days=5),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+# Сколько секунд версия токенов пользователя живёт в кэше
+TOKEN_VERSION_CACHE_TIMEOUT = 60
 DOMAIN_NAME = 'yamdb.ru'
 DEFAULT_FROM_EMAIL = f'from@{DOMAIN_NAME}'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Очередь исходящих писем: число попыток и базовая задержка повтора (сек.)
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+EMAIL_QUEUE_BACKOFF = 60
+
+# Превышение бюджета SQL-запросов представления: предупреждение в логе
+# api.query_budget или, в строгом режиме (для тестов), исключение
+QUERY_BUDGET_STRICT = False
+
+# Выборочное профилирование запросов: доля профилируемых запросов,
+# заголовок, которым администратор профилирует свой запрос (значение 1),
+# и каталог со статистикой для команды profile_report
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 0.01
+PROFILING_HEADER = 'X-Profile'
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Размеры пулов потоков ASGI-приложения: общего и для запросов на чтение
+ASGI_THREADS = 8
+ASGI_READ_THREADS = 8
+
+# Наибольшее число объектов в одном запросе к .../bulk/
+BULK_MAX_ITEMS = 5000
+
+# Лента изменений: событий в ответе по умолчанию и наибольшее число, и
+# задержка в секундах, после которой событие отдаётся. В SQLite записи
+# идут по очереди, для PostgreSQL задержка должна превышать длительность
+# пишущих транзакций
+CHANGE_FEED_LIMIT = 500
+CHANGE_FEED_MAX_LIMIT = 5000
+CHANGE_FEED_DELAY = 0
+
+# За сколько последних дней считаются отзывы в рейтинге обсуждаемых
+RANKING_DISCUSSED_DAYS = 7
@@ -0,0 +1,177 @@
+import platform
+import time
+from contextlib import nullcontext
+
+import django
+from api.authentication import get_access_token
+from bench import report
+from bench.runners import ASGIRunner, InProcessRunner, WSGIRunner
+from bench.scenarios import build_endpoints, get_reader
+from bench.seed import SIZES, seed
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+MODES = ('inprocess', 'wsgi', 'asgi')
+# Параметры прогона, без совпадения которых сравнение бессмысленно.
+COMPARABLE = ('concurrency', 'auth')
+
+
+class Command(BaseCommand):
+    help = ('Measures API latency, throughput and queries per request, '
+            'optionally against a stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', nargs='+', choices=MODES + ('all',),
+            default=['inprocess'],
+            help='Drive the API in-process and/or over HTTP to WSGI or '
+                 'ASGI, in the given order')
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Measured requests per endpoint')
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Unmeasured requests per endpoint before measuring')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Only run the named endpoint, can be repeated')
+        parser.add_argument(
+            '--auth', action='store_true',
+            help='Send every request with a token, bypassing the '
+                 'anonymous response cache')
+        parser.add_argument(
+            '--url', help='Base URL of a running server for wsgi or asgi '
+                          'mode, instead of starting one')
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Parallel clients in wsgi and asgi modes')
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Replace titles, genres, categories, reviews and comments '
+                 'with synthetic data before running')
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false',
+            dest='interactive',
+            help='Do not ask to confirm that --seed wipes the content')
+        for name, size in SIZES.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=size,
+                help=f'Number of {name} to seed')
+        parser.add_argument(
+            '--random-seed', type=int, default=0,
+            help='Seed of the synthetic data generator')
+        parser.add_argument(
+            '--save-baseline', metavar='PATH',
+            help='Write results to a baseline JSON file')
+        parser.add_argument(
+            '--compare', metavar='PATH',
+            help='Fail if results regress against a baseline JSON file')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed relative regression of latency and rps')
+        parser.add_argument(
+            '--slack-ms', type=float, default=1.0,
+            help='Latency growth in milliseconds always tolerated')
+        parser.add_argument(
+            '--throttle', action='store_true',
+            help='Keep API rate limits of the local servers; by default '
+                 'they are off so the run measures the API, not 429s')
+
+    def throttling(self, enabled):
+        if enabled:
+            return nullcontext()
+        rest_framework = settings.REST_FRAMEWORK
+        return override_settings(REST_FRAMEWORK=dict(
+            rest_framework, DEFAULT_THROTTLE_RATES=dict.fromkeys(
+                rest_framework.get('DEFAULT_THROTTLE_RATES', ()))))
+
+    def get_runners(self, options, token):
+        modes = MODES if 'all' in options['mode'] else options['mode']
+        for mode in modes:
+            if mode == 'inprocess':
+                yield InProcessRunner(token)
+            else:
+                runner_class = WSGIRunner if mode == 'wsgi' else ASGIRunner
+                yield runner_class(token, options['url'],
+                                   options['concurrency'])
+
+    def measure(self, runner, endpoint, options):
+        auth = endpoint.auth or options['auth']
+        runner.run(endpoint, options['warmup'], auth)
+        started = time.perf_counter()
+        samples = runner.run(endpoint, options['requests'], auth)
+        return report.summarize(samples, time.perf_counter() - started)
+
+    def run(self, endpoints, token, options):
+        results = {}
+        for runner in self.get_runners(options, token):
+            try:
+                results[runner.name] = {
+                    endpoint.name: self.measure(runner, endpoint, options)
+                    for endpoint in endpoints
+                }
+            finally:
+                runner.close()
+        return results
+
+    def check_baseline(self, results, options):
+        baseline = report.load_baseline(options['compare'])
+        for key in COMPARABLE:
+            if baseline['meta'].get(key) != options[key]:
+                raise CommandError(
+                    f'Baseline was recorded with {key}='
+                    f'{baseline["meta"].get(key)}, got {options[key]}')
+        regressions = report.compare(
+            baseline, results, options['tolerance'], options['slack_ms'])
+        if regressions:
+            raise CommandError(
+                'Regressions against baseline:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def confirm_seed(self):
+        database = settings.DATABASES['default']['NAME']
+        answer = input(
+            'You have requested to seed the database.\n'
+            'This will IRREVERSIBLY DESTROY all titles, genres, categories, '
+            f'reviews and comments in the {database!r} database.\n'
+            "Type 'yes' to continue, or 'no' to cancel: ")
+        return answer == 'yes'
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        sizes = {name: options[name] for name in SIZES}
+        if options['seed']:
+            if options['interactive'] and not self.confirm_seed():
+                self.stdout.write('Seeding cancelled.')
+                return
+            sizes = seed(sizes, options['random_seed'])
+            self.stdout.write(
+                'Seeded: ' + ', '.join(f'{name}={count}'
+                                       for name, count in sizes.items()))
+        reader = get_reader()
+        token = str(get_access_token(reader)) if reader else None
+        endpoints = [endpoint
+                     for endpoint in build_endpoints(options['endpoints'])
+                     if token is not None or not endpoint.auth]
+        if not endpoints:
+            raise CommandError('No endpoints to run')
+        with self.throttling(options['throttle']):
+            results = self.run(endpoints, token, options)
+        for line in report.render(results):
+            self.stdout.write(line)
+        if options['save_baseline']:
+            report.save_baseline(options['save_baseline'], results, {
+                'created': timezone.now().isoformat(),
+                'sizes': sizes,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'auth': options['auth'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            })
+            self.stdout.write(f'Baseline saved to {options["save_baseline"]}')
+        if options['compare']:
+            self.check_baseline(results, options)
@@ -0,0 +1,51 @@
+import time
+
+from api.serializers import (CategorySerializer, GenreSerializer,
+                             TitleReadSerializer)
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+from reviews.models import Title
+
+
+class NestedTitleReadSerializer(serializers.ModelSerializer):
+    """Прежний вариант с вложенными сериализаторами, для сравнения."""
+    rating = serializers.IntegerField(read_only=True)
+    genre = GenreSerializer(read_only=True, many=True, source='genres')
+    category = CategorySerializer(read_only=True)
+
+    class Meta:
+        fields = TitleReadSerializer.Meta.fields
+        model = Title
+
+
+class Command(BaseCommand):
+    help = 'Measures title serialization cost with and without fragments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1000,
+                            help='Number of titles to serialize')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of runs, the best one is reported')
+
+    def measure(self, serializer_class, titles, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serializer_class(titles, many=True).data
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best / len(titles) * 1e6
+
+    def handle(self, *args, **options):
+        titles = list(Title.objects.with_relations()[:options['titles']])
+        if not titles:
+            raise CommandError('No titles to serialize, load data first')
+        nested = self.measure(
+            NestedTitleReadSerializer, titles, options['repeat'])
+        fragments = self.measure(
+            TitleReadSerializer, titles, options['repeat'])
+        self.stdout.write(f'Titles: {len(titles)}')
+        self.stdout.write(f'Nested serializers: {nested:.1f} us/title')
+        self.stdout.write(f'Cached fragments: {fragments:.1f} us/title')
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: {nested / fragments:.2f}x'))
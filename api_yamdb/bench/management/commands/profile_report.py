@@ -0,0 +1,61 @@
+import glob
+import json
+import os
+import pstats
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls')
+
+
+class Command(BaseCommand):
+    help = ('Merges sampled request profiles written by ProfilingMiddleware '
+            'and prints the top functions per endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', default=settings.PROFILING_DIR,
+            help='Directory with collected profiles')
+        parser.add_argument(
+            '--sort', choices=SORT_KEYS, default='cumulative',
+            help='Sort order of the functions')
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Number of functions printed per endpoint')
+        parser.add_argument(
+            '--view', help='Only endpoints whose name contains this text')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Remove the collected profiles after printing')
+
+    def merge(self, path):
+        profiles = sorted(glob.glob(os.path.join(path, '*.prof')))
+        if not profiles:
+            return None, 0
+        requests = 0
+        for counter in glob.glob(os.path.join(path, '*.json')):
+            with open(counter) as file:
+                requests += json.load(file)['requests']
+        return pstats.Stats(*profiles, stream=self.stdout), requests
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['dir']):
+            raise CommandError(f'No profiles in {options["dir"]}')
+        endpoints = sorted(
+            name for name in os.listdir(options['dir'])
+            if os.path.isdir(os.path.join(options['dir'], name))
+            and (not options['view'] or options['view'] in name))
+        for name in endpoints:
+            stats, requests = self.merge(os.path.join(options['dir'], name))
+            if stats is None:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {requests} requests, '
+                f'{stats.total_tt / max(requests, 1) * 1000:.1f} ms '
+                f'per request'))
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(
+                options['limit'])
+        if options['clear']:
+            shutil.rmtree(options['dir'])
@@ -0,0 +1,101 @@
+"""Сводка замеров, базовая линия и поиск регрессий."""
+import json
+import math
+import statistics
+
+PERCENTILES = (50, 95, 99)
+# Перцентили задержки, которые сравниваются с базовой линией.
+LATENCY_METRICS = ('p50', 'p95')
+
+
+def percentile(values, q):
+    """Перцентиль с линейной интерполяцией между соседними значениями."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (
+        ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples, elapsed):
+    """Сводка по списку (статус, секунды, запросы к базе)."""
+    timings = [seconds * 1000 for _, seconds, _ in samples]
+    queries = [count for _, _, count in samples if count is not None]
+    summary = {
+        'requests': len(samples),
+        'errors': sum(1 for status, _, _ in samples if status >= 400),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'queries': (round(statistics.mean(queries), 2)
+                    if queries else None),
+    }
+    for q in PERCENTILES:
+        summary[f'p{q}'] = round(percentile(timings, q), 3)
+    return summary
+
+
+def render(results):
+    """Таблица по режимам и эндпоинтам, задержки в миллисекундах."""
+    header = (f'{"mode":<10} {"endpoint":<20} {"p50":>8} {"p95":>8} '
+              f'{"p99":>8} {"rps":>8} {"queries":>7} {"errors":>6}')
+    lines = [header, '-' * len(header)]
+    for mode, endpoints in results.items():
+        for name, summary in endpoints.items():
+            queries = summary['queries']
+            lines.append(
+                f'{mode:<10} {name:<20} {summary["p50"]:>8.2f} '
+                f'{summary["p95"]:>8.2f} {summary["p99"]:>8.2f} '
+                f'{summary["rps"] or 0:>8.1f} '
+                f'{"-" if queries is None else queries:>7} '
+                f'{summary["errors"]:>6}')
+    return lines
+
+
+def save_baseline(path, results, meta):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'meta': meta, 'results': results}, file,
+                  ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare(baseline, results, tolerance, slack_ms=1.0):
+    """Список регрессий относительно базовой линии.
+
+    Задержка считается регрессией, если выросла больше чем на tolerance
+    и на slack_ms сразу: для быстрых эндпоинтов шум в доли миллисекунды
+    иначе даёт ложные срабатывания. Число запросов к базе детерминировано
+    и сравнивается без допуска.
+    """
+    regressions = []
+    for mode, endpoints in results.items():
+        base_endpoints = baseline['results'].get(mode, {})
+        for name, summary in endpoints.items():
+            base = base_endpoints.get(name)
+            if base is None:
+                continue
+            for metric in LATENCY_METRICS:
+                limit = base[metric] * (1 + tolerance) + slack_ms
+                if summary[metric] > limit:
+                    regressions.append(
+                        f'{mode} {name}: {metric} {summary[metric]:.2f} ms '
+                        f'> {base[metric]:.2f} ms')
+            if base['rps'] and summary['rps'] is not None:
+                if summary['rps'] < base['rps'] * (1 - tolerance):
+                    regressions.append(
+                        f'{mode} {name}: rps {summary["rps"]:.1f} '
+                        f'< {base["rps"]:.1f}')
+            if (base['queries'] is not None
+                    and summary['queries'] is not None
+                    and summary['queries'] > base['queries']):
+                regressions.append(
+                    f'{mode} {name}: queries {summary["queries"]} '
+                    f'> {base["queries"]}')
+            if summary['errors'] > base['errors']:
+                regressions.append(
+                    f'{mode} {name}: errors {summary["errors"]} '
+                    f'> {base["errors"]}')
+    return regressions
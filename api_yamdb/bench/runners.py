@@ -0,0 +1,157 @@
+"""Исполнители запросов: в процессе через APIClient и по HTTP к WSGI/ASGI."""
+import multiprocessing
+import re
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from rest_framework.test import APIClient
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class InProcessRunner:
+    """Запросы через APIClient в том же процессе.
+
+    Число SQL-запросов считается точно, но в задержку не входят сеть
+    и WSGI-сервер.
+    """
+    name = 'inprocess'
+
+    def __init__(self, token=None):
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        if token is not None:
+            self.authenticated.credentials(
+                HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def request(self, endpoint, auth):
+        client = self.authenticated if auth else self.anonymous
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # execute_wrapper, а не CaptureQueriesContext: журнал запросов
+        # ограничен 9000 записями и на длинном прогоне перестаёт расти.
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            response = client.get(endpoint.path)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, len(queries)
+
+    def run(self, endpoint, count, auth=False):
+        return [self.request(endpoint, auth) for _ in range(count)]
+
+    def close(self):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_wsgi(port_queue):
+    server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                         server_class=ThreadingWSGIServer,
+                         handler_class=QuietHandler)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def serve_asgi(port_queue):
+    import uvicorn
+    from api_yamdb.asgi import application
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    # Соединения ждут в очереди, пока uvicorn запускается.
+    sock.listen(1024)
+    port_queue.put(sock.getsockname()[1])
+    server = uvicorn.Server(uvicorn.Config(
+        application, log_level='warning', lifespan='on'))
+    server.run(sockets=[sock])
+
+
+class HTTPRunner:
+    """Запросы по HTTP к приложению в отдельном процессе.
+
+    Без base_url поднимает сервер в дочернем процессе; с ним ходит на
+    уже запущенный сервер (gunicorn, uvicorn). Число SQL-запросов
+    берётся из заголовка Server-Timing, который ставит
+    QueryBudgetMiddleware.
+    """
+    name = None
+    serve = None
+
+    def __init__(self, token=None, base_url=None, concurrency=1):
+        self.token = token
+        self.concurrency = concurrency
+        self.process = None
+        if base_url is None:
+            base_url = self.start()
+        self.base_url = base_url.rstrip('/')
+
+    def start(self):
+        # Дочерний процесс не должен унаследовать открытые соединения.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        port_queue = context.Queue()
+        self.process = context.Process(
+            target=type(self).serve, args=(port_queue,), daemon=True)
+        self.process.start()
+        return f'http://127.0.0.1:{port_queue.get(timeout=30)}'
+
+    def request(self, endpoint, auth):
+        headers = {}
+        if auth and self.token is not None:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = Request(self.base_url + endpoint.path, headers=headers)
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=30) as response:
+                response.read()
+        except HTTPError as e:
+            response = e
+        elapsed = time.perf_counter() - started
+        match = SERVER_TIMING_QUERIES.search(
+            response.headers.get('Server-Timing', ''))
+        return (response.status, elapsed,
+                int(match.group(1)) if match else None)
+
+    def run(self, endpoint, count, auth=False):
+        if self.concurrency == 1:
+            return [self.request(endpoint, auth) for _ in range(count)]
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            return list(executor.map(
+                lambda _: self.request(endpoint, auth), range(count)))
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+
+class WSGIRunner(HTTPRunner):
+    """wsgiref с потоком на соединение."""
+    name = 'wsgi'
+    serve = staticmethod(serve_wsgi)
+
+
+class ASGIRunner(HTTPRunner):
+    """uvicorn с api_yamdb.asgi и ограниченными пулами потоков."""
+    name = 'asgi'
+    serve = staticmethod(serve_asgi)
@@ -0,0 +1,130 @@
+"""Наполнение базы синтетическими данными для нагрузочных прогонов."""
+import random
+
+from django.db import transaction
+from reviews.bulk_load import refresh_derived
+from reviews.models import (CHANGE_CREATED, Category, ChangeEvent, Comment,
+                            Genre, Review, Title, TitleGenre, User)
+
+SIZES = {
+    'users': 50,
+    'genres': 10,
+    'categories': 5,
+    'titles': 500,
+    'reviews': 2000,
+    'comments': 4000,
+}
+USER_PREFIX = 'bench_'
+WORDS = (
+    'побег', 'шоушенк', 'крёстный', 'отец', 'властелин', 'колец', 'война',
+    'мир', 'звёздные', 'войны', 'матрица', 'начало', 'интерстеллар',
+    'криминальное', 'чтиво', 'зелёная', 'миля', 'бойцовский', 'клуб',
+    'форрест', 'гамп', 'леон', 'гладиатор', 'титаник', 'аватар',
+)
+BATCH_SIZE = 500
+
+
+def phrase(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def clear():
+    """Удаляет контент и пользователей прошлых прогонов."""
+    for model in (Comment, Review, TitleGenre, Title, Genre, Category):
+        model.objects.all().delete()
+    User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+
+def create_users(rng, count):
+    User.objects.bulk_create(
+        (User(username=f'{USER_PREFIX}{number}',
+              email=f'{USER_PREFIX}{number}@yamdb.fake',
+              bio=phrase(rng, 5))
+         for number in range(count)),
+        batch_size=BATCH_SIZE)
+    # SQLite не возвращает id из bulk_create, перечитываем.
+    return list(User.objects.filter(
+        username__startswith=USER_PREFIX).values_list('pk', flat=True))
+
+
+def create_dictionary(model, prefix, count):
+    model.objects.bulk_create(
+        (model(name=f'{prefix.capitalize()} {number}',
+               slug=f'{prefix}-{number}')
+         for number in range(count)),
+        batch_size=BATCH_SIZE)
+    return list(model.objects.values_list('pk', flat=True))
+
+
+def create_titles(rng, count, genre_ids, category_ids):
+    Title.objects.bulk_create(
+        (Title(name=phrase(rng, 3), year=rng.randint(1950, 2022),
+               description=phrase(rng, 20),
+               category_id=rng.choice(category_ids))
+         for _ in range(count)),
+        batch_size=BATCH_SIZE)
+    title_ids = list(Title.objects.values_list('pk', flat=True))
+    TitleGenre.objects.bulk_create(
+        (TitleGenre(title_id=title_id, genre_id=genre_id)
+         for title_id in title_ids
+         for genre_id in rng.sample(genre_ids, min(2, len(genre_ids)))),
+        batch_size=BATCH_SIZE)
+    return title_ids
+
+
+def create_reviews(rng, count, title_ids, user_ids):
+    # Пара (произведение, автор) уникальна, поэтому выбираем номера пар.
+    pairs = len(title_ids) * len(user_ids)
+    Review.objects.bulk_create(
+        (Review(title_id=title_ids[pair // len(user_ids)],
+                author_id=user_ids[pair % len(user_ids)],
+                text=phrase(rng, 30), score=rng.randint(1, 10))
+         for pair in rng.sample(range(pairs), min(count, pairs))),
+        batch_size=BATCH_SIZE)
+    return list(Review.objects.values_list('pk', flat=True))
+
+
+def create_comments(rng, count, review_ids, user_ids):
+    Comment.objects.bulk_create(
+        (Comment(review_id=rng.choice(review_ids),
+                 author_id=rng.choice(user_ids), text=phrase(rng, 12))
+         for _ in range(count)),
+        batch_size=BATCH_SIZE)
+    return list(Comment.objects.values_list('pk', flat=True))
+
+
+def seed(sizes=None, random_seed=0):
+    """Заменяет контент базы синтетическим набором заданного размера.
+
+    Возвращает фактические размеры: отзывов может быть меньше
+    запрошенного, если не хватает пар произведение-автор.
+    """
+    sizes = {**SIZES, **(sizes or {})}
+    rng = random.Random(random_seed)
+    with transaction.atomic():
+        clear()
+        user_ids = create_users(rng, sizes['users'])
+        genre_ids = create_dictionary(Genre, 'genre', sizes['genres'])
+        category_ids = create_dictionary(
+            Category, 'category', sizes['categories'])
+        title_ids = create_titles(
+            rng, sizes['titles'], genre_ids, category_ids)
+        review_ids = create_reviews(
+            rng, sizes['reviews'], title_ids, user_ids)
+        comment_ids = []
+        if review_ids:
+            comment_ids = create_comments(
+                rng, sizes['comments'], review_ids, user_ids)
+        # Лента /changes/ получает созданные объекты, как при импорте.
+        for kind, ids in (('title', title_ids), ('review', review_ids),
+                          ('comment', comment_ids)):
+            ChangeEvent.objects.log_many(kind, CHANGE_CREATED, ids)
+    refresh_derived()
+    return {
+        'users': len(user_ids),
+        'genres': len(genre_ids),
+        'categories': len(category_ids),
+        'titles': len(title_ids),
+        'reviews': len(review_ids),
+        'comments': len(comment_ids),
+    }
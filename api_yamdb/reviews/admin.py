@@ -1,6 +1,6 @@
 from django.contrib import admin
-from reviews.models import (Category, Comment, Genre, Review, Title,
-                            TitleGenre, User)
+from reviews.models import (Category, Comment, Genre, QueuedEmail, Review,
+                            Title, TitleGenre, User)
 
 admin.site.register(User)
 admin.site.register(Genre)
@@ -9,3 +9,4 @@ admin.site.register(TitleGenre)
 admin.site.register(Title)
 admin.site.register(Review)
 admin.site.register(Comment)
+admin.site.register(QueuedEmail)
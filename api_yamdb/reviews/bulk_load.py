@@ -0,0 +1,25 @@
+"""Общие шаги после массовой загрузки в обход сигналов.
+
+bulk_create не отправляет сигналы, поэтому импорт CSV и наполнение
+синтетическими данными пересчитывают производные данные явно.
+"""
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from reviews.models import (CATEGORY_STAMP, GENRE_STAMP, TITLE_STAMP,
+                            TableVersion)
+
+
+def refresh_derived(stdout=None):
+    """Рейтинги, поисковый индекс, таблицы рейтингов, версии и кэш.
+
+    stdout - куда писать вывод команд, по умолчанию он отбрасывается.
+    """
+    stdout = stdout or StringIO()
+    call_command('recalculate_ratings', verbosity=0, stdout=stdout)
+    call_command('rebuild_search_index', stdout=stdout)
+    call_command('refresh_rankings', verbosity=0, stdout=stdout)
+    TableVersion.objects.bump(TITLE_STAMP, GENRE_STAMP, CATEGORY_STAMP)
+    caches[settings.RESPONSE_CACHE_ALIAS].clear()
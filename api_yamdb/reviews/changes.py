@@ -0,0 +1,55 @@
+"""Лента изменений из журнала ChangeEvent.
+
+Клиент хранит курсор - id последнего полученного события - и
+запрашивает события после него. К событию прикладывается текущее
+состояние объекта в формате выгрузки (reviews.export), состояния
+читаются одним запросом на вид объекта для всей пачки. У удалённых
+объектов состояния нет.
+
+Сначала зеркало заполняется выгрузкой, затем догоняет ленту с курсора,
+полученного до начала выгрузки.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from reviews.export import snapshots
+from reviews.models import CHANGE_DELETED, ChangeEvent
+
+# Вид объекта в журнале и вид выгрузки.
+EXPORT_KINDS = {'title': 'titles', 'review': 'reviews', 'comment': 'comments'}
+
+
+def latest_cursor():
+    return ChangeEvent.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+
+
+def read(since, limit):
+    """Возвращает события после курсора, новый курсор и есть ли ещё."""
+    queryset = ChangeEvent.objects.filter(pk__gt=since)
+    if settings.CHANGE_FEED_DELAY:
+        # id выдаются при вставке, а видны события после фиксации:
+        # задержка не даёт курсору обогнать ещё не зафиксированные.
+        queryset = queryset.filter(created__lte=timezone.now() - timedelta(
+            seconds=settings.CHANGE_FEED_DELAY))
+    events = list(queryset.order_by('pk')[:limit + 1])
+    has_more = len(events) > limit
+    events = events[:limit]
+    ids = {}
+    for event in events:
+        if event.action != CHANGE_DELETED:
+            ids.setdefault(event.kind, set()).add(event.object_id)
+    states = {kind: snapshots(EXPORT_KINDS[kind], object_ids)
+              for kind, object_ids in ids.items()}
+    return [
+        {
+            'cursor': event.pk,
+            'kind': event.kind,
+            'id': event.object_id,
+            'action': event.action,
+            'time': event.created,
+            'data': states.get(event.kind, {}).get(event.object_id),
+        }
+        for event in events
+    ], events[-1].pk if events else since, has_more
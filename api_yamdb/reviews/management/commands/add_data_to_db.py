@@ -1,11 +1,23 @@
 import csv
+import json
+import multiprocessing
 import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, connections, transaction
 from reviews import models
+from reviews.bulk_load import refresh_derived
+from reviews.signals import CHANGE_LOG
 
 DATA_DIR = os.path.join(settings.BASE_DIR, 'static', 'data')
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_REJECT_FILE = 'rejected_rows.csv'
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
 
 name_path = {
     'Category': os.path.join(DATA_DIR, 'category.csv'),
@@ -18,156 +30,393 @@ name_path = {
 }
 
 
+def known_id(known, model_name, value):
+    """Проверяет внешний ключ по множеству id, загруженному один раз."""
+    pk = int(value)
+    if pk not in known[model_name]:
+        raise ValueError(f'{model_name} with id={pk} does not exist')
+    return pk
+
+
+def build_category(row, known):
+    return models.Category(
+        id=int(row['id']), name=row['name'], slug=row['slug'])
+
+
+def build_genre(row, known):
+    return models.Genre(
+        id=int(row['id']), name=row['name'], slug=row['slug'])
+
+
+def build_title(row, known):
+    return models.Title(
+        id=int(row['id']),
+        name=row['name'],
+        year=int(row['year']),
+        category_id=known_id(known, 'Category', row['category']),
+    )
+
+
+def build_title_genre(row, known):
+    return models.TitleGenre(
+        id=int(row['id']),
+        title_id=known_id(known, 'Title', row['title_id']),
+        genre_id=known_id(known, 'Genre', row['genre_id']),
+    )
+
+
+def build_user(row, known):
+    role = row.get('role') or models.USER
+    if role not in dict(models.ROLES):
+        raise ValueError(f'Unknown role {role}')
+    return models.User(
+        id=int(row['id']),
+        username=row['username'],
+        email=row['email'],
+        role=role,
+        bio=row.get('bio', ''),
+        first_name=row.get('first_name', ''),
+        last_name=row.get('last_name', ''),
+    )
+
+
+def build_review(row, known):
+    score = int(row['score'])
+    if not 1 <= score <= 10:
+        raise ValueError(f'Score {score} is out of range')
+    return models.Review(
+        id=int(row['id']),
+        title_id=known_id(known, 'Title', row['title_id']),
+        text=row['text'],
+        author_id=known_id(known, 'User', row['author']),
+        score=score,
+        pub_date=row['pub_date'],
+    )
+
+
+def build_comment(row, known):
+    return models.Comment(
+        id=int(row['id']),
+        review_id=known_id(known, 'Review', row['review_id']),
+        text=row['text'],
+        author_id=known_id(known, 'User', row['author']),
+        pub_date=row['pub_date'],
+    )
+
+
+Loader = namedtuple(
+    'Loader', ('name', 'model', 'build', 'unique_fields', 'depends_on'))
+
+LOADERS = (
+    Loader('Category', models.Category, build_category, (('slug',),), ()),
+    Loader('Genre', models.Genre, build_genre, (('slug',),), ()),
+    Loader('User', models.User, build_user, (('username',), ('email',)),
+           ()),
+    Loader('Title', models.Title, build_title, (), ('Category',)),
+    Loader('TitleGenre', models.TitleGenre, build_title_genre, (),
+           ('Title', 'Genre')),
+    Loader('Review', models.Review, build_review,
+           (('title_id', 'author_id'),), ('Title', 'User')),
+    Loader('Comment', models.Comment, build_comment, (),
+           ('Review', 'User')),
+)
+LOADERS_BY_NAME = {loader.name: loader for loader in LOADERS}
+
+
+def header_length(path):
+    with open(path, 'rb') as csvfile:
+        return len(csvfile.readline())
+
+
+def split_shards(path, shard_bytes):
+    """Делит файл на диапазоны байт по границам записей CSV.
+
+    Граница ставится только в конце строки вне кавычек, поэтому
+    многострочные значения в кавычках не разрезаются.
+    """
+    start = offset = header_length(path)
+    shards = []
+    in_quotes = False
+    with open(path, 'rb') as csvfile:
+        csvfile.seek(offset)
+        for line in csvfile:
+            offset += len(line)
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            if not in_quotes and offset - start >= shard_bytes:
+                shards.append((start, offset))
+                start = offset
+    if offset > start:
+        shards.append((start, offset))
+    return shards
+
+
+def read_lines(path, start, end):
+    with open(path, 'rb') as csvfile:
+        csvfile.seek(start)
+        offset = start
+        for line in csvfile:
+            if end is not None and offset >= end:
+                return
+            offset += len(line)
+            yield line.decode('utf-8')
+
+
+def read_chunks(path, size, start=None, end=None):
+    """Потоково читает CSV (или его диапазон байт) пачками по size строк."""
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        fieldnames = next(csv.reader(csvfile))
+    if start is None:
+        start = header_length(path)
+    reader = csv.DictReader(read_lines(path, start, end),
+                            fieldnames=fieldnames, delimiter=',')
+    while True:
+        chunk = list(islice(reader, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Importer:
+    """Загрузка CSV в базу пачками через bulk_create."""
+
+    def __init__(self, batch_size, reject_path, progress=None):
+        self.batch_size = batch_size
+        self.reject_path = reject_path
+        self.progress = progress
+        self.reject_file = None
+        self.reject_writer = None
+        self.rejected = 0
+        self.known = {}
+        self.unique_keys = {}
+
+    def load_known(self, loaders):
+        """Загружает существующие id и уникальные ключи один раз."""
+        for loader in loaders:
+            manager = loader.model.objects
+            self.known[loader.name] = set(
+                manager.values_list('pk', flat=True))
+            for fields in loader.unique_fields:
+                self.unique_keys[loader.name, fields] = set(
+                    manager.values_list(*fields))
+
+    def reject(self, loader, row, error):
+        if self.reject_writer is None:
+            self.reject_file = open(self.reject_path, 'w', newline='',
+                                    encoding='utf-8')
+            self.reject_writer = csv.writer(self.reject_file)
+            self.reject_writer.writerow(('model', 'error', 'row'))
+        self.reject_writer.writerow(
+            (loader.name, error, json.dumps(row, ensure_ascii=False)))
+        self.rejected += 1
+
+    def close(self):
+        if self.reject_file is not None:
+            self.reject_file.close()
+
+    def prepare(self, loader, rows):
+        """Собирает объекты пачки, отбраковывая заведомо плохие строки."""
+        objects = []
+        for row in rows:
+            try:
+                obj = loader.build(row, self.known)
+                if obj.pk in self.known[loader.name]:
+                    raise ValueError(f'id={obj.pk} already exists')
+                keys = [
+                    (fields, tuple(getattr(obj, field) for field in fields))
+                    for fields in loader.unique_fields
+                ]
+                for fields, key in keys:
+                    if key in self.unique_keys[loader.name, fields]:
+                        raise ValueError(f'{fields} {key} already exists')
+            except (KeyError, TypeError, ValueError) as e:
+                self.reject(loader, row, repr(e))
+                continue
+            self.known[loader.name].add(obj.pk)
+            for fields, key in keys:
+                self.unique_keys[loader.name, fields].add(key)
+            objects.append((row, obj))
+        return objects
+
+    def log_changes(self, loader, created):
+        """События ленты /changes/, которые bulk_create не пишет."""
+        if loader.model is models.TitleGenre:
+            models.ChangeEvent.objects.log_many(
+                CHANGE_LOG[models.Title], models.CHANGE_UPDATED,
+                dict.fromkeys(obj.title_id for obj in created))
+        elif loader.model in CHANGE_LOG:
+            models.ChangeEvent.objects.log_many(
+                CHANGE_LOG[loader.model], models.CHANGE_CREATED,
+                (obj.pk for obj in created))
+
+    def write_batch(self, loader, objects):
+        try:
+            with transaction.atomic():
+                loader.model.objects.bulk_create(obj for _, obj in objects)
+            created = [obj for _, obj in objects]
+        except IntegrityError:
+            # Пачка не вставилась целиком: ищем виновные строки по одной.
+            created = []
+            for row, obj in objects:
+                try:
+                    with transaction.atomic():
+                        loader.model.objects.bulk_create((obj,))
+                    created.append(obj)
+                except IntegrityError as e:
+                    self.known[loader.name].discard(obj.pk)
+                    self.reject(loader, row, repr(e))
+        self.log_changes(loader, created)
+        return len(created)
+
+    def load(self, loader, start=None, end=None):
+        started = time.monotonic()
+        created = 0
+        chunks = read_chunks(
+            name_path[loader.name], self.batch_size, start, end)
+        with transaction.atomic():
+            for rows in chunks:
+                objects = self.prepare(loader, rows)
+                if objects:
+                    created += self.write_batch(loader, objects)
+                if self.progress is not None:
+                    self.progress(loader, created,
+                                  time.monotonic() - started)
+        return created, time.monotonic() - started
+
+
+def load_shard(name, start, end, batch_size, reject_path):
+    """Загружает один диапазон файла в отдельном процессе."""
+    loader = LOADERS_BY_NAME[name]
+    importer = Importer(batch_size, reject_path)
+    importer.load_known(
+        [loader] + [LOADERS_BY_NAME[dep] for dep in loader.depends_on])
+    try:
+        created, elapsed = importer.load(loader, start, end)
+    finally:
+        importer.close()
+        connections.close_all()
+    return name, start, end, created, elapsed, importer.rejected
+
+
+def rate(created, elapsed):
+    return f'{created / elapsed if elapsed else 0:.0f} rows/sec'
+
+
 class Command(BaseCommand):
     help = 'Adds data to the database'
 
-    def add_categories(self):
-        with open(name_path['Category'], newline='',
-                  encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=',')
-            for category_data in reader:
-                try:
-                    new_category = models.Category(
-                        id=category_data.get('id'),
-                        name=category_data.get('name'),
-                        slug=category_data.get('slug')
-                    )
-                    new_category.save()
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(
-                        f'Creation skipped. Unable to create an object {e}'))
-                    continue
-        self.stdout.write(self.style.SUCCESS('Categories added successfully'))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows per bulk insert')
+        parser.add_argument(
+            '--reject-file', default=DEFAULT_REJECT_FILE,
+            help='CSV file for rows that could not be imported')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of processes loading independent files and shards')
+        parser.add_argument(
+            '--shard-bytes', type=int, default=DEFAULT_SHARD_BYTES,
+            help='Approximate shard size for splitting large files')
 
-    def add_genres(self):
-        with open(name_path['Genre'], newline='',
-                  encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=',')
-            for genre_data in reader:
-                try:
-                    new_genre = models.Genre(
-                        id=genre_data.get('id'),
-                        name=genre_data.get('name'),
-                        slug=genre_data.get('slug')
-                    )
-                    new_genre.save()
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(
-                        f'Creation skipped. Unable to create an object {e}'))
-                    continue
-        self.stdout.write(self.style.SUCCESS('Genres added successfully'))
+    def write_progress(self, loader, created, elapsed):
+        self.stdout.write(
+            f'{loader.name}: {created} rows, {rate(created, elapsed)}')
 
-    def add_titles(self):
-        with open(name_path['Title'], newline='',
-                  encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=',')
-            for title_data in reader:
-                try:
-                    new_title = models.Title(
-                        id=title_data.get('id'),
-                        name=title_data.get('name'),
-                        year=title_data.get('year'),
-                        category=models.Category.objects.get(
-                            id=title_data.get('category')))
-                    new_title.save()
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(
-                        f'Creation skipped. Unable to create an object {e}'))
-                    continue
-        self.stdout.write(self.style.SUCCESS('Titles added successfully'))
+    def load_sequential(self, batch_size, reject_path):
+        importer = Importer(batch_size, reject_path, self.write_progress)
+        importer.load_known(LOADERS)
+        try:
+            for loader in LOADERS:
+                created, _ = importer.load(loader)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{loader.name} added successfully: {created} rows'))
+        finally:
+            importer.close()
+        return importer.rejected
 
-    def add_title_genre(self):
-        with open(name_path['TitleGenre'], newline='',
-                  encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=',')
-            for title_genre_data in reader:
-                try:
-                    new_title_genre = models.TitleGenre(
-                        id=title_genre_data.get('id'),
-                        title=models.Title.objects.get(
-                            id=title_genre_data.get('title_id')),
-                        genre=models.Genre.objects.get(
-                            id=title_genre_data.get('genre_id')
-                        )
-                    )
-                    new_title_genre.save()
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(
-                        f'Creation skipped. Unable to create an object {e}'))
-                    continue
-        self.stdout.write(self.style.SUCCESS(
-            'Title Genre relations added successfully'))
-
-    def add_users(self):
-        with open(name_path['User'], newline='',
-                  encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=',')
-            for user_data in reader:
-                try:
-                    new_user = models.User(
-                        id=user_data.get('id'),
-                        username=user_data.get('username'),
-                        email=user_data.get('email'),
-                        role=user_data.get('role'),
-                    )
-                    new_user.save()
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(
-                        f'Creation skipped. Unable to create an object {e}'))
-                    continue
-        self.stdout.write(self.style.SUCCESS('Users added successfully'))
+    def load_parallel(self, workers, batch_size, reject_path, shard_bytes):
+        """Запускает загрузчики по графу зависимостей.
 
-    def add_reviews(self):
-        with open(name_path['Review'], newline='',
-                  encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=',')
-            for review_data in reader:
-                try:
-                    new_review = models.Review(
-                        id=review_data.get('id'),
-                        title=models.Title.objects.get(
-                            id=review_data.get('title_id')),
-                        text=review_data.get('text'),
-                        author=models.User.objects.get(
-                            id=review_data.get('author')),
-                        score=review_data.get('score'),
-                        pub_date=review_data.get('pub_date'),
-                    )
-                    new_review.save()
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(
-                        f'Creation skipped. Unable to create an object {e}'))
+        Загрузчик стартует, как только завершены все шарды тех моделей,
+        от которых он зависит; независимые модели и шарды одного файла
+        грузятся одновременно.
+        """
+        shards = {
+            loader.name: split_shards(name_path[loader.name], shard_bytes)
+            for loader in LOADERS
+        }
+        pending = {name: len(parts) for name, parts in shards.items()}
+        done, started, running = set(), set(), {}
+        reject_parts = []
+        rejected = 0
+        # Дочерние процессы не должны наследовать открытое соединение.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            while len(done) < len(LOADERS):
+                for loader in LOADERS:
+                    if loader.name in started or not done.issuperset(
+                            loader.depends_on):
+                        continue
+                    started.add(loader.name)
+                    if not shards[loader.name]:
+                        done.add(loader.name)
+                        continue
+                    for number, (start, end) in enumerate(
+                            shards[loader.name]):
+                        part = f'{reject_path}.{loader.name}.{number}'
+                        reject_parts.append(part)
+                        future = executor.submit(
+                            load_shard, loader.name, start, end,
+                            batch_size, part)
+                        running[future] = loader.name
+                if not running:
                     continue
-        self.stdout.write(self.style.SUCCESS('Reviews added successfully'))
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    _, start, end, created, elapsed, failed = future.result()
+                    rejected += failed
+                    self.stdout.write(
+                        f'{name} [{start}:{end}]: {created} rows, '
+                        f'{rate(created, elapsed)}')
+                    pending[name] -= 1
+                    if not pending[name]:
+                        done.add(name)
+                        self.stdout.write(self.style.SUCCESS(
+                            f'{name} added successfully'))
+        self.merge_rejects(reject_parts, reject_path)
+        return rejected
 
-    def add_comments(self):
-        with open(name_path['Comment'], newline='',
-                  encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=',')
-            for comment_data in reader:
-                try:
-                    new_comment = models.Comment(
-                        id=comment_data.get('id'),
-                        review=models.Review.objects.get(
-                            id=comment_data.get('review_id')),
-                        text=comment_data.get('text'),
-                        author=models.User.objects.get(
-                            id=comment_data.get('author')),
-                        pub_date=comment_data.get('pub_date'),
-                    )
-                    new_comment.save()
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(
-                        f'Creation skipped. Unable to create an object {e}'))
-                    continue
-        self.stdout.write(self.style.SUCCESS('Comments added successfully'))
-
-    def handle(self, *args, **kwargs):
-        self.add_categories()
-        self.add_genres()
-        self.add_titles()
-        self.add_title_genre()
-        self.add_users()
-        self.add_reviews()
-        self.add_comments()
+    def merge_rejects(self, parts, reject_path):
+        parts = [part for part in parts if os.path.exists(part)]
+        if not parts:
+            return
+        with open(reject_path, 'w', newline='', encoding='utf-8') as target:
+            for number, part in enumerate(parts):
+                with open(part, newline='', encoding='utf-8') as source:
+                    if number:
+                        next(source)
+                    target.writelines(source)
+                os.remove(part)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        reject_path = options['reject_file']
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite does not support concurrent writers, '
+                'falling back to a single worker'))
+            workers = 1
+        if workers > 1:
+            rejected = self.load_parallel(
+                workers, batch_size, reject_path, options['shard_bytes'])
+        else:
+            rejected = self.load_sequential(batch_size, reject_path)
+        refresh_derived(self.stdout)
+        if rejected:
+            self.stdout.write(self.style.WARNING(
+                f'Rejected rows: {rejected}, see {reject_path}'))
         self.stdout.write(self.style.SUCCESS('Data added successfully'))
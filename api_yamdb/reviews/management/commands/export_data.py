@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from reviews.export import CHUNK_SIZE, EXPORTS, FORMATS, export, parse_since
+
+
+class Command(BaseCommand):
+    help = ('Streams titles, reviews or comments as NDJSON or CSV, '
+            'optionally only those updated since a moment')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=tuple(EXPORTS))
+        parser.add_argument(
+            '--format', dest='output', choices=tuple(FORMATS),
+            default='ndjson', help='Output format')
+        parser.add_argument(
+            '--updated-since',
+            help='ISO 8601 datetime; export only objects updated since it')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Rows fetched from the database cursor at once')
+        parser.add_argument(
+            '--output', dest='path',
+            help='File to write to instead of standard output')
+
+    def handle(self, *args, **options):
+        since = options['updated_since']
+        if since:
+            try:
+                since = parse_since(since)
+            except ValueError as e:
+                raise CommandError(e)
+        blocks = export(options['kind'], options['output'], since,
+                        options['chunk_size'])
+        if options['path'] is None:
+            for block in blocks:
+                self.stdout.write(block, ending='')
+            return
+        with open(options['path'], 'w', encoding='utf-8',
+                  newline='') as file:
+            for block in blocks:
+                file.write(block)
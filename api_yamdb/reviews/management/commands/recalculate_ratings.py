@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from reviews.models import TITLE_STAMP, TableVersion, Title
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds denormalized title ratings and reports drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report drift without saving changes')
+
+    def handle(self, *args, **options):
+        titles = Title.objects.annotate(
+            actual_sum=Sum('reviews__score'),
+            actual_count=Count('reviews'),
+        ).order_by('pk')
+        drifted = []
+        now = timezone.now()
+        for title in titles.iterator():
+            actual_sum = title.actual_sum or 0
+            actual_count = title.actual_count
+            actual_rating = (actual_sum / actual_count
+                             if actual_count else None)
+            if (title.rating_sum, title.rating_count, title.rating) == (
+                    actual_sum, actual_count, actual_rating):
+                continue
+            if options['verbosity'] > 0:
+                self.stdout.write(self.style.WARNING(
+                    f'Title {title.pk}: stored '
+                    f'{title.rating_sum}/{title.rating_count}, '
+                    f'actual {actual_sum}/{actual_count}'))
+            title.rating_sum = actual_sum
+            title.rating_count = actual_count
+            title.rating = actual_rating
+            title.updated = now
+            drifted.append(title)
+        if drifted and not options['dry_run']:
+            with transaction.atomic():
+                Title.objects.bulk_update(
+                    drifted,
+                    ('rating_sum', 'rating_count', 'rating', 'updated'),
+                    batch_size=BATCH_SIZE)
+                TableVersion.objects.bump(TITLE_STAMP)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ratings checked, titles with drift: {len(drifted)}'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from reviews.rankings import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds materialized title rankings; run periodically to '
+            'move the most discussed window')
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        if options['verbosity'] > 0:
+            self.stdout.write(self.style.SUCCESS(f'Ranking rows: {rows}'))
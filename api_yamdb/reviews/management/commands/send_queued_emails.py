@@ -0,0 +1,105 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from reviews.models import QueuedEmail
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails in batches over one mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of emails taken from the queue at once')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the queue instead of exiting when it is empty')
+        parser.add_argument(
+            '--interval', type=float, default=DEFAULT_INTERVAL,
+            help='Seconds to wait between polls in --loop mode')
+
+    def get_batch(self, batch_size):
+        queryset = QueuedEmail.objects.filter(
+            sent__isnull=True,
+            attempts__lt=settings.EMAIL_QUEUE_MAX_ATTEMPTS,
+            next_attempt__lte=timezone.now(),
+        )
+        # Несколько воркеров не должны забирать одни и те же письма.
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        return list(queryset[:batch_size])
+
+    def reschedule(self, email, error):
+        email.attempts += 1
+        email.next_attempt = timezone.now() + timedelta(
+            seconds=settings.EMAIL_QUEUE_BACKOFF * 2 ** (email.attempts - 1))
+        email.last_error = repr(error)
+
+    def send_messages(self, mail_connection, emails):
+        sent = failed = 0
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email,
+                (email.recipient,), connection=mail_connection)
+            try:
+                mail_connection.send_messages((message,))
+            except Exception as e:
+                self.reschedule(email, e)
+                failed += 1
+            else:
+                email.attempts += 1
+                email.sent = timezone.now()
+                email.last_error = ''
+                sent += 1
+        return sent, failed
+
+    def send_batch(self, emails):
+        mail_connection = get_connection()
+        try:
+            mail_connection.open()
+        except Exception as e:
+            # Сервер недоступен: вся пачка откладывается с попыткой,
+            # иначе воркер падал бы и снова забирал те же письма.
+            for email in emails:
+                self.reschedule(email, e)
+            sent, failed = 0, len(emails)
+        else:
+            try:
+                sent, failed = self.send_messages(mail_connection, emails)
+            finally:
+                mail_connection.close()
+        QueuedEmail.objects.bulk_update(
+            emails, ('attempts', 'next_attempt', 'sent', 'last_error'))
+        return sent, failed
+
+    def drain(self, batch_size):
+        total_sent = total_failed = 0
+        while True:
+            with transaction.atomic():
+                emails = self.get_batch(batch_size)
+                if not emails:
+                    break
+                sent, failed = self.send_batch(emails)
+            total_sent += sent
+            total_failed += failed
+            if len(emails) < batch_size:
+                break
+        return total_sent, total_failed
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = self.drain(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Emails sent: {sent}, failed: {failed}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
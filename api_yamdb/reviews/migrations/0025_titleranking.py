@@ -0,0 +1,72 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:41
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def fill_rankings(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    TitleGenre = apps.get_model('reviews', 'TitleGenre')
+    Review = apps.get_model('reviews', 'Review')
+    TitleRanking = apps.get_model('reviews', 'TitleRanking')
+    genres = defaultdict(list)
+    for title_id, genre_id in TitleGenre.objects.values_list(
+            'title_id', 'genre_id'):
+        genres[title_id].append(f'genre:{genre_id}')
+    since = timezone.now() - timedelta(days=settings.RANKING_DISCUSSED_DAYS)
+    discussed = dict(
+        Review.objects.filter(pub_date__gte=since).order_by()
+        .values('title_id').annotate(count=Count('id'))
+        .values_list('title_id', 'count'))
+    rows = []
+    for title_id, category_id, rating in Title.objects.values_list(
+            'id', 'category_id', 'rating'):
+        scopes = ['all', *genres[title_id]]
+        if category_id is not None:
+            scopes.append(f'category:{category_id}')
+        for board, score in (('rated', rating),
+                             ('discussed', discussed.get(title_id))):
+            if score:
+                rows.extend(TitleRanking(board=board, scope=scope,
+                                         title_id=title_id, score=score)
+                            for scope in scopes)
+    TitleRanking.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0024_auto_20261018_2026'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('rated', 'Лучшие по оценке'), ('discussed', 'Самые обсуждаемые')], max_length=16, verbose_name='Рейтинг')),
+                ('scope', models.CharField(max_length=32, verbose_name='Область')),
+                ('score', models.FloatField(verbose_name='Значение')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='reviews.Title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Место в рейтинге',
+                'verbose_name_plural': 'Рейтинги произведений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='titleranking',
+            index=models.Index(fields=['board', 'scope', '-score', 'title'], name='ranking_board_scope_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='titleranking',
+            constraint=models.UniqueConstraint(fields=('board', 'scope', 'title'), name='unique_board_scope_title'),
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
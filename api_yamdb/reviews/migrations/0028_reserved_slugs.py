@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:24
+
+from django.db import migrations, models
+import reviews.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0027_changeevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(unique=True, validators=[reviews.validators.validate_slug], verbose_name='Уникальное имя'),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='slug',
+            field=models.SlugField(unique=True, validators=[reviews.validators.validate_slug], verbose_name='Уникальное имя'),
+        ),
+    ]
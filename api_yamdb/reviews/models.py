@@ -1,13 +1,42 @@
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from reviews.validators import validate_year
+from django.db import (IntegrityError, connections, models, router,
+                       transaction)
+from django.db.models import Count, F
+from django.utils import timezone
+from reviews.validators import validate_slug, validate_year
 
 GENRE_NAME_MAX_LENGTH = 256
 GENRE_SLUG_MAX_LENGTH = 50
 CATEGORY_NAME_MAX_LENGTH = 256
 CATEGORY_SLUG_MAX_LENGTH = 50
 
+TITLE_STAMP = 'title'
+GENRE_STAMP = 'genre'
+CATEGORY_STAMP = 'category'
+
+TOP_RATED = 'rated'
+MOST_DISCUSSED = 'discussed'
+BOARDS = (
+    (TOP_RATED, 'Лучшие по оценке'),
+    (MOST_DISCUSSED, 'Самые обсуждаемые'),
+)
+GLOBAL_SCOPE = 'all'
+
+CHANGE_CREATED = 'created'
+CHANGE_UPDATED = 'updated'
+CHANGE_DELETED = 'deleted'
+CHANGE_ACTIONS = (
+    (CHANGE_CREATED, 'Создание'),
+    (CHANGE_UPDATED, 'Изменение'),
+    (CHANGE_DELETED, 'Удаление'),
+)
+CHANGE_KINDS = (
+    ('title', 'Произведение'),
+    ('review', 'Отзыв'),
+    ('comment', 'Комментарий'),
+)
+
 USER = 'user'
 MODERATOR = 'moderator'
 ADMIN = 'admin'
@@ -16,6 +45,8 @@ ROLES = (
     (MODERATOR, 'Модератор'),
     (ADMIN, 'Администратор')
 )
+# Поля пользователя, смена которых отзывает его токены.
+ACCESS_FIELDS = ('is_active', 'is_superuser', 'role')
 
 
 class MyUserManager(UserManager):
@@ -50,6 +81,10 @@ class User(AbstractUser):
         default=USER,
         verbose_name='Роль',
     )
+    token_version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Версия токенов',
+    )
     objects = MyUserManager()
 
     REQUIRED_FIELDS = ('email', 'password')
@@ -59,6 +94,41 @@ class User(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_access = {
+            field: instance.__dict__[field] for field in ACCESS_FIELDS
+            if field in instance.__dict__}
+        return instance
+
+    def access_changed(self):
+        loaded = getattr(self, '_loaded_access', None)
+        if self._state.adding or loaded is None:
+            return False
+        return any(
+            field in self.__dict__
+            and (field not in loaded or loaded[field] != self.__dict__[field])
+            for field in ACCESS_FIELDS)
+
+    def save(self, *args, **kwargs):
+        """Смена роли, is_superuser или is_active отзывает токены.
+
+        Версия растёт в том же UPDATE, а закэшированную версию сбрасывает
+        сигнал post_save в api.signals. Запись через QuerySet.update()
+        токены не отзывает.
+        """
+        self._tokens_revoked = self.access_changed()
+        if self._tokens_revoked:
+            self.token_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_access = {
+            field: self.__dict__[field] for field in ACCESS_FIELDS
+            if field in self.__dict__}
+
     @property
     def is_admin(self):
         return any((self.role == ADMIN, self.is_superuser))
@@ -72,6 +142,7 @@ class Genre(models.Model):
     name = models.TextField(max_length=GENRE_NAME_MAX_LENGTH,
                             verbose_name='Название')
     slug = models.SlugField(unique=True, max_length=GENRE_SLUG_MAX_LENGTH,
+                            validators=(validate_slug,),
                             verbose_name='Уникальное имя')
 
     class Meta:
@@ -87,6 +158,7 @@ class Category(models.Model):
     name = models.TextField(max_length=CATEGORY_NAME_MAX_LENGTH,
                             verbose_name='Название')
     slug = models.SlugField(unique=True, max_length=CATEGORY_SLUG_MAX_LENGTH,
+                            validators=(validate_slug,),
                             verbose_name='Уникальное имя')
 
     class Meta:
@@ -98,6 +170,48 @@ class Category(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    """Планирование запросов для чтения произведений."""
+
+    def with_relations(self):
+        return self.select_related('category').prefetch_related('genres')
+
+    def facets(self):
+        """Число произведений по жанрам, категориям и годам.
+
+        Считается четырьмя агрегирующими запросами независимо от числа
+        значений в каждом фасете.
+        """
+        titles = self.order_by()
+        genres = TitleGenre.objects.filter(
+            title__in=titles.values('pk')
+        ).values('genre__slug', 'genre__name').annotate(
+            count=Count('title', distinct=True)
+        ).order_by('-count', 'genre__slug')
+        categories = titles.filter(category__isnull=False).values(
+            'category__slug', 'category__name'
+        ).annotate(
+            count=Count('pk', distinct=True)
+        ).order_by('-count', 'category__slug')
+        years = titles.values('year').annotate(
+            count=Count('pk', distinct=True)
+        ).order_by('year')
+        return {
+            'count': titles.count(),
+            'genres': [
+                {'slug': row['genre__slug'], 'name': row['genre__name'],
+                 'count': row['count']}
+                for row in genres
+            ],
+            'categories': [
+                {'slug': row['category__slug'],
+                 'name': row['category__name'], 'count': row['count']}
+                for row in categories
+            ],
+            'years': list(years),
+        }
+
+
 class Title(models.Model):
     name = models.TextField(verbose_name='Название')
     year = models.PositiveSmallIntegerField(validators=(validate_year,),
@@ -107,11 +221,25 @@ class Title(models.Model):
     genres = models.ManyToManyField(Genre, through='TitleGenre',
                                     verbose_name='Жанры')
     category = models.ForeignKey(Category, related_name='titles', null=True,
-                                 on_delete=models.SET_NULL,
+                                 on_delete=models.SET_NULL, db_index=False,
                                  verbose_name='Категория')
+    rating_sum = models.PositiveIntegerField(default=0,
+                                             verbose_name='Сумма оценок')
+    rating_count = models.PositiveIntegerField(default=0,
+                                               verbose_name='Число оценок')
+    rating = models.FloatField(null=True, blank=True,
+                               verbose_name='Рейтинг')
+    updated = models.DateTimeField(auto_now=True, db_index=True,
+                                   verbose_name='Дата изменения')
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
+        indexes = (
+            # Фильтр по категории с сортировкой списка по -id.
+            models.Index(fields=('category', '-id'),
+                         name='title_category_id_idx'),
+        )
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
 
@@ -119,11 +247,70 @@ class Title(models.Model):
         return self.name
 
 
+class TitleGenreManager(models.Manager):
+
+    def replace(self, genres_by_title):
+        """Приводит жанры произведений к заданным наборам id.
+
+        Пишется только разница: лишние связи удаляются одним DELETE,
+        новые вставляются bulk_create. Сигналы по строкам не
+        отправляются, вызывающий код сам обновляет зависимые данные.
+        Возвращает id произведений, у которых жанры изменились.
+        """
+        existing = {}
+        for pk, title_id, genre_id in self.filter(
+                title_id__in=genres_by_title).values_list(
+                    'pk', 'title_id', 'genre_id'):
+            existing.setdefault(title_id, {})[genre_id] = pk
+        stale = []
+        fresh = []
+        for title_id, genre_ids in genres_by_title.items():
+            current = existing.get(title_id, {})
+            stale.extend(pk for genre_id, pk in current.items()
+                         if genre_id not in genre_ids)
+            fresh.extend(self.model(title_id=title_id, genre_id=genre_id)
+                         for genre_id in genre_ids
+                         if genre_id not in current)
+        if stale:
+            self.delete_links(stale)
+        if fresh:
+            self.bulk_create(fresh)
+        return ({title_id for title_id, genre_ids in genres_by_title.items()
+                 if set(genre_ids) != set(existing.get(title_id, ()))})
+
+    def delete_links(self, pks):
+        """Удаляет связи по id без сигналов.
+
+        delete() при подключённых сигналах выбирает и удаляет строки по
+        одной, здесь же - один DELETE на пачку id.
+        """
+        connection = connections[router.db_for_write(self.model)]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        column = quote_name(self.model._meta.pk.column)
+        size = connection.ops.bulk_batch_size(('pk',), pks)
+        with connection.cursor() as cursor:
+            for start in range(0, len(pks), size):
+                batch = pks[start:start + size]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+                    batch)
+
+
 class TitleGenre(models.Model):
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE,
-                              verbose_name='Жанр')
+                              db_index=False, verbose_name='Жанр')
     title = models.ForeignKey(Title, on_delete=models.CASCADE,
                               verbose_name='Произведение')
+    objects = TitleGenreManager()
+
+    class Meta:
+        indexes = (
+            # Фильтр произведений по жанру берёт title_id из индекса.
+            models.Index(fields=('genre', 'title'),
+                         name='titlegenre_genre_title_idx'),
+        )
 
     def __str__(self):
         return f'{self.title} - {self.genre}'
@@ -134,6 +321,7 @@ class Review(models.Model):
         Title,
         on_delete=models.CASCADE,
         related_name='reviews',
+        db_index=False,
         verbose_name='id Произведения'
     )
     text = models.TextField(
@@ -157,6 +345,11 @@ class Review(models.Model):
         verbose_name='Дата публикации',
         db_index=True
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+        db_index=True
+    )
 
     class Meta:
         ordering = ('-pub_date',)
@@ -166,15 +359,29 @@ class Review(models.Model):
                 name='unique_title_author'
             ),
         )
+        indexes = (
+            # Лента отзывов произведения, в том числе курсорная.
+            models.Index(fields=('title', '-pub_date', '-id'),
+                         name='review_title_pub_date_idx'),
+        )
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Запоминаем исходную оценку, чтобы при изменении
+        # пересчитать рейтинг произведения без лишнего запроса.
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
 
 class Comment(models.Model):
     review = models.ForeignKey(
         Review,
         on_delete=models.CASCADE,
         related_name='comments',
+        db_index=False,
         verbose_name='id Ревью'
     )
     text = models.TextField(
@@ -191,8 +398,152 @@ class Comment(models.Model):
         verbose_name='Дата добавления',
         db_index=True
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+        db_index=True
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            # Лента комментариев к отзыву, в том числе курсорная.
+            models.Index(fields=('review', '-pub_date', '-id'),
+                         name='comment_review_pub_date_idx'),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+
+
+class QueuedEmail(models.Model):
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст')
+    from_email = models.EmailField(verbose_name='Отправитель')
+    recipient = models.EmailField(verbose_name='Получатель')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата постановки в очередь')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='Попытки')
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True,
+                                        verbose_name='Следующая попытка')
+    sent = models.DateTimeField(null=True, blank=True,
+                                verbose_name='Дата отправки')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Очередь писем'
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
+
+
+class TableVersionManager(models.Manager):
+    """Счётчики версий таблиц для условных GET-запросов."""
+
+    def get_stamps(self, name, *related):
+        """Счётчик таблицы name и версии таблиц related одним запросом.
+
+        Строка создаётся только для name: таблица без строки версии ещё
+        не менялась, её версия 0.
+        """
+        stamps = self.in_bulk((name, *related))
+        stamp = stamps.get(name)
+        if stamp is None:
+            try:
+                with transaction.atomic():
+                    stamp = self.create(name=name, updated=timezone.now())
+            except IntegrityError:
+                stamp = self.get(name=name)
+            stamps[name] = stamp
+        return stamp, {
+            key: stamps[key].version if key in stamps else 0
+            for key in (name, *related)}
+
+    def bump(self, *names):
+        now = timezone.now()
+        for name in names:
+            if not self.filter(name=name).update(
+                    version=F('version') + 1, updated=now):
+                self.get_or_create(
+                    name=name, defaults={'version': 1, 'updated': now})
+
+
+class TableVersion(models.Model):
+    name = models.CharField(max_length=50, primary_key=True,
+                            verbose_name='Таблица')
+    version = models.PositiveIntegerField(default=0, verbose_name='Версия')
+    updated = models.DateTimeField(verbose_name='Дата изменения')
+    objects = TableVersionManager()
+
+    class Meta:
+        verbose_name = 'Версия таблицы'
+        verbose_name_plural = 'Версии таблиц'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
+class TitleRanking(models.Model):
+    """Материализованное место произведения в рейтинге.
+
+    Область (scope) - весь каталог, жанр или категория: 'all',
+    'genre:<id>', 'category:<id>'. Строки пересчитываются модулем
+    reviews.rankings.
+    """
+    board = models.CharField(max_length=16, choices=BOARDS,
+                             verbose_name='Рейтинг')
+    scope = models.CharField(max_length=32, verbose_name='Область')
+    title = models.ForeignKey(Title, on_delete=models.CASCADE,
+                              related_name='rankings',
+                              verbose_name='Произведение')
+    score = models.FloatField(verbose_name='Значение')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('board', 'scope', 'title'),
+                                    name='unique_board_scope_title'),
+        )
+        indexes = (
+            models.Index(fields=('board', 'scope', '-score', 'title'),
+                         name='ranking_board_scope_idx'),
+        )
+        verbose_name = 'Место в рейтинге'
+        verbose_name_plural = 'Рейтинги произведений'
+
+    def __str__(self):
+        return f'{self.board} {self.scope}: {self.title_id} ({self.score})'
+
+
+class ChangeEventManager(models.Manager):
+
+    def log_many(self, kind, action, object_ids):
+        self.bulk_create(
+            (self.model(kind=kind, action=action, object_id=object_id)
+             for object_id in object_ids),
+            batch_size=500)
+
+
+class ChangeEvent(models.Model):
+    """Запись журнала изменений, только добавляется.
+
+    id события - курсор ленты /changes/: записи пишутся в транзакции
+    изменения, поэтому откаченные изменения в журнал не попадают.
+    """
+    kind = models.CharField(max_length=16, choices=CHANGE_KINDS,
+                            verbose_name='Вид объекта')
+    object_id = models.PositiveIntegerField(verbose_name='id объекта')
+    action = models.CharField(max_length=16, choices=CHANGE_ACTIONS,
+                              verbose_name='Действие')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата события')
+    objects = ChangeEventManager()
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Событие журнала изменений'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.id}: {self.action} {self.kind} {self.object_id}'
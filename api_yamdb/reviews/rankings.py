@@ -0,0 +1,150 @@
+"""Пересчёт материализованных рейтингов TitleRanking.
+
+Рейтинги по оценке и по числу отзывов за последние
+RANKING_DISCUSSED_DAYS дней ведутся для всего каталога, каждого жанра и
+каждой категории. После записи отзыва или произведения пересчитываются
+строки одного произведения; окно «обсуждаемых» сдвигается полным
+пересчётом командой refresh_rankings.
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.utils import timezone
+from reviews.models import (GLOBAL_SCOPE, MOST_DISCUSSED, TOP_RATED, Review,
+                            Title, TitleGenre, TitleRanking)
+
+BATCH_SIZE = 500
+
+
+def genre_scope(genre_id):
+    return f'genre:{genre_id}'
+
+
+def category_scope(category_id):
+    return f'category:{category_id}'
+
+
+def title_scopes(category_id, genre_ids):
+    scopes = [GLOBAL_SCOPE]
+    if category_id is not None:
+        scopes.append(category_scope(category_id))
+    scopes.extend(genre_scope(genre_id) for genre_id in genre_ids)
+    return scopes
+
+
+def discussed_since():
+    return timezone.now() - timedelta(days=settings.RANKING_DISCUSSED_DAYS)
+
+
+def title_rows(title_id, category_id, genre_ids, rating, discussed):
+    scopes = title_scopes(category_id, genre_ids)
+    rows = []
+    if rating is not None:
+        rows.extend(TitleRanking(board=TOP_RATED, scope=scope,
+                                 title_id=title_id, score=rating)
+                    for scope in scopes)
+    if discussed:
+        rows.extend(TitleRanking(board=MOST_DISCUSSED, scope=scope,
+                                 title_id=title_id, score=discussed)
+                    for scope in scopes)
+    return rows
+
+
+def refresh_title(title_id):
+    """Пересчитывает строки одного произведения.
+
+    Строка произведения блокируется до конца пересчёта: два параллельных
+    пересчёта одного произведения иначе вставили бы одни и те же строки
+    после удаления и нарушили уникальность (board, scope, title).
+    Блокировку берёт пустая запись, а не чтение FOR UPDATE: SQLite не
+    ждёт busy timeout, если транзакция начала с чтения и затем пишет, а
+    сразу отвечает «database is locked».
+    """
+    titles = Title.objects.filter(pk=title_id)
+    with transaction.atomic():
+        titles.update(rating_count=F('rating_count'))
+        title = titles.annotate(discussed=Subquery(
+            Review.objects.filter(
+                title_id=OuterRef('pk'), pub_date__gte=discussed_since()
+            ).order_by().values('title_id').annotate(
+                count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        )).values('category_id', 'rating', 'rating_count',
+                  'discussed').first()
+        rankings = TitleRanking.objects.filter(title_id=title_id)
+        # Без отзывов произведения нет ни в одном рейтинге.
+        if title is None or not title['rating_count']:
+            rankings.delete()
+            return
+        genre_ids = list(TitleGenre.objects.filter(
+            title_id=title_id).values_list('genre_id', flat=True))
+        rankings.delete()
+        TitleRanking.objects.bulk_create(title_rows(
+            title_id, title['category_id'], genre_ids, title['rating'],
+            title['discussed']))
+
+
+class PendingRefresh:
+    """Произведения, ждущие пересчёта после фиксации транзакции."""
+
+    def __init__(self):
+        self.title_ids = {}
+        self.done = False
+
+    def __call__(self):
+        # Первый из обработчиков пачки пересчитывает её целиком.
+        if self.done:
+            return
+        self.done = True
+        if getattr(pending, 'refresh', None) is self:
+            pending.refresh = None
+        for title_id in self.title_ids:
+            refresh_title(title_id)
+
+
+# Пачка пересчёта текущей транзакции этого потока.
+pending = threading.local()
+
+
+def schedule_refresh(title_id):
+    """Пересчёт после фиксации транзакции, не больше одного на произведение.
+
+    При каскадном удалении произведения отзывы удаляются раньше него,
+    и строки, вставленные посреди удаления, ссылались бы на удалённое
+    произведение. Смена жанров или удаление отзывов в одной транзакции
+    дают много сигналов, но один пересчёт.
+
+    Обработчик регистрируется при каждом вызове: после отката
+    транзакции или точки сохранения её обработчики отбрасываются, а
+    пачка переходит к следующей транзакции и выполняется с ней.
+    """
+    refresh = getattr(pending, 'refresh', None)
+    if refresh is None:
+        refresh = pending.refresh = PendingRefresh()
+    refresh.title_ids[title_id] = None
+    transaction.on_commit(refresh)
+
+
+def rebuild():
+    """Полный пересчёт всех рейтингов, возвращает число строк."""
+    genres = defaultdict(list)
+    for title_id, genre_id in TitleGenre.objects.values_list(
+            'title_id', 'genre_id'):
+        genres[title_id].append(genre_id)
+    discussed = dict(
+        Review.objects.filter(pub_date__gte=discussed_since())
+        .order_by().values('title_id').annotate(count=Count('id'))
+        .values_list('title_id', 'count'))
+    rows = []
+    for title_id, category_id, rating in Title.objects.values_list(
+            'id', 'category_id', 'rating'):
+        rows.extend(title_rows(title_id, category_id, genres[title_id],
+                               rating, discussed.get(title_id)))
+    with transaction.atomic():
+        TitleRanking.objects.all().delete()
+        TitleRanking.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
@@ -0,0 +1,147 @@
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+from reviews.models import (CATEGORY_STAMP, CHANGE_CREATED, CHANGE_DELETED,
+                            CHANGE_UPDATED, GENRE_STAMP, TITLE_STAMP,
+                            Category, ChangeEvent, Comment, Genre, Review,
+                            TableVersion, Title, TitleGenre, TitleRanking)
+from reviews.rankings import category_scope, schedule_refresh
+
+# Какие версии таблиц меняются при записи модели. Жанры, категории и
+# отзывы встроены в ответы по произведениям, поэтому меняют и их версию.
+STAMPS = {
+    Title: (TITLE_STAMP,),
+    TitleGenre: (TITLE_STAMP,),
+    Review: (TITLE_STAMP,),
+    Genre: (GENRE_STAMP, TITLE_STAMP),
+    Category: (CATEGORY_STAMP, TITLE_STAMP),
+}
+
+# Вид объекта в журнале изменений. Пересчёт рейтинга произведения
+# следует из событий его отзывов и отдельно не записывается.
+CHANGE_LOG = {Title: 'title', Review: 'review', Comment: 'comment'}
+
+
+def update_title_rating(title_id, score_delta, count_delta):
+    """Инкрементально обновляет рейтинг произведения одним UPDATE.
+
+    Выражения в SET вычисляются по старым значениям строки,
+    поэтому рейтинг считается от уже сдвинутых суммы и количества.
+    """
+    new_sum = F('rating_sum') + score_delta
+    new_count = F('rating_count') + count_delta
+    Title.objects.filter(pk=title_id).update(
+        updated=timezone.now(),
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating=Case(
+            When(rating_count=-count_delta, then=Value(None)),
+            default=Cast(new_sum, FloatField()) / new_count,
+            output_field=FloatField(),
+        ),
+    )
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        update_title_rating(instance.title_id, instance.score, 1)
+        schedule_refresh(instance.title_id)
+    else:
+        old_score = getattr(instance, '_loaded_score', None)
+        if old_score is not None and old_score != instance.score:
+            update_title_rating(
+                instance.title_id, instance.score - old_score, 0)
+            schedule_refresh(instance.title_id)
+    instance._loaded_score = instance.score
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    update_title_rating(instance.title_id, -instance.score, -1)
+    schedule_refresh(instance.title_id)
+
+
+@receiver(post_save, sender=Title)
+def title_saved(sender, instance, created, raw=False, **kwargs):
+    # У нового произведения ещё нет ни оценки, ни отзывов.
+    if not created and not raw:
+        schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=TitleGenre)
+@receiver(post_delete, sender=TitleGenre)
+def title_genre_written(sender, instance, raw=False, **kwargs):
+    # Удаление жанра каскадом удаляет связи по одной и приходит сюда же.
+    if not raw:
+        schedule_refresh(instance.title_id)
+        # Жанры входят в выгрузку произведения, а связь пишется без
+        # сохранения самого произведения.
+        Title.objects.filter(pk=instance.title_id).update(
+            updated=timezone.now())
+        ChangeEvent.objects.create(kind=CHANGE_LOG[Title],
+                                   object_id=instance.title_id,
+                                   action=CHANGE_UPDATED)
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleting(sender, instance, **kwargs):
+    titles = Title.objects.filter(category_id=instance.pk)
+    ChangeEvent.objects.log_many(CHANGE_LOG[Title], CHANGE_UPDATED,
+                                 titles.values_list('pk', flat=True))
+    # Отвязку произведений SET_NULL сделает UPDATE без auto_now.
+    titles.update(updated=timezone.now())
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Произведения отвязываются от категории UPDATE без сигналов.
+    TitleRanking.objects.filter(scope=category_scope(instance.pk)).delete()
+
+
+def bump_stamps(sender, **kwargs):
+    TableVersion.objects.bump(*STAMPS[sender])
+
+
+for model in STAMPS:
+    post_save.connect(bump_stamps, sender=model,
+                      dispatch_uid=f'bump_stamps_save_{model.__name__}')
+    post_delete.connect(bump_stamps, sender=model,
+                        dispatch_uid=f'bump_stamps_delete_{model.__name__}')
+
+
+@receiver(m2m_changed, sender=TitleGenre)
+def title_genres_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if not action.startswith('post_'):
+        return
+    TableVersion.objects.bump(*STAMPS[TitleGenre])
+    title_ids = (pk_set or ()) if reverse else (instance.pk,)
+    for title_id in title_ids:
+        schedule_refresh(title_id)
+    ChangeEvent.objects.log_many(CHANGE_LOG[Title], CHANGE_UPDATED,
+                                 title_ids)
+
+
+def log_change(sender, instance, signal, created=False, raw=False,
+               **kwargs):
+    if raw:
+        return
+    if signal is post_delete:
+        action = CHANGE_DELETED
+    else:
+        action = CHANGE_CREATED if created else CHANGE_UPDATED
+    ChangeEvent.objects.create(kind=CHANGE_LOG[sender],
+                               object_id=instance.pk, action=action)
+
+
+for model in CHANGE_LOG:
+    post_save.connect(log_change, sender=model,
+                      dispatch_uid=f'log_change_save_{model.__name__}')
+    post_delete.connect(log_change, sender=model,
+                        dispatch_uid=f'log_change_delete_{model.__name__}')
@@ -2,7 +2,15 @@ from datetime import MINYEAR, datetime
 
 from django.core.exceptions import ValidationError
 
+# Адреса действий над списком, которые совпали бы с адресом объекта.
+RESERVED_SLUGS = ('bulk',)
+
 
 def validate_year(value):
     if not MINYEAR <= value <= datetime.now().year:
         raise ValidationError('Год указан неправильно')
+
+
+def validate_slug(value):
+    if value in RESERVED_SLUGS:
+        raise ValidationError(f'Имя {value} зарезервировано')
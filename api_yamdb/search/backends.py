@@ -0,0 +1,170 @@
+"""Бэкенды полнотекстового поиска.
+
+Документ описывается видом (title/review/comment), id объекта, id
+родителя (произведение для отзыва, отзыв для комментария), заголовком
+и текстом. Заголовок при ранжировании весит больше текста.
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+from search.stemmer import tokenize
+
+TABLE = 'search_document'
+KINDS = {'title': 0, 'review': 1, 'comment': 2}
+
+
+class BaseSearchBackend:
+
+    def install(self):
+        raise NotImplementedError
+
+    def uninstall(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+    def index(self, kind, object_id, heading='', body='', parent_id=None):
+        raise NotImplementedError
+
+    def index_many(self, kind, documents):
+        """documents - пары (id объекта, словарь аргументов index)."""
+        for object_id, document in documents:
+            self.index(kind, object_id, **document)
+
+    def remove(self, kind, object_id):
+        raise NotImplementedError
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+    def search(self, kind, query, parent_id=None, limit=None):
+        """Возвращает id объектов по убыванию релевантности."""
+        raise NotImplementedError
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """FTS5 по основам слов из русского стеммера.
+
+    rowid документа вычисляется из вида и id объекта, поэтому
+    обновление и удаление идут по первичному ключу, а не перебором.
+    """
+
+    def rowid(self, kind, object_id):
+        return int(object_id) * len(KINDS) + KINDS[kind]
+
+    def prepare(self, text):
+        return ' '.join(tokenize(text))
+
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+                'heading, body, kind UNINDEXED, parent_id UNINDEXED, '
+                "tokenize='unicode61 remove_diacritics 2')")
+
+    def index(self, kind, object_id, heading='', body='', parent_id=None):
+        rowid = self.rowid(kind, object_id)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', (rowid,))
+            cursor.execute(
+                f'INSERT INTO {TABLE} '
+                '(rowid, heading, body, kind, parent_id) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                (rowid, self.prepare(heading), self.prepare(body), kind,
+                 parent_id))
+
+    def index_many(self, kind, documents):
+        rows = [(self.rowid(kind, object_id),
+                 self.prepare(document.get('heading', '')),
+                 self.prepare(document.get('body', '')), kind,
+                 document.get('parent_id'))
+                for object_id, document in documents]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                               [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {TABLE} '
+                '(rowid, heading, body, kind, parent_id) '
+                'VALUES (%s, %s, %s, %s, %s)', rows)
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                           (self.rowid(kind, object_id),))
+
+    def search(self, kind, query, parent_id=None, limit=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Каждая основа ищется как префикс, условия объединяются через AND.
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = (f'SELECT rowid FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s AND kind = %s')
+        params = [match, kind]
+        if parent_id is not None:
+            sql += ' AND parent_id = %s'
+            params.append(int(parent_id))
+        sql += f' ORDER BY bm25({TABLE}, 10.0, 1.0)'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [rowid // len(KINDS) for rowid, in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector с русской конфигурацией и GIN-индексом."""
+
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+                'kind varchar(16) NOT NULL, '
+                'object_id integer NOT NULL, '
+                'parent_id integer NULL, '
+                'document tsvector NOT NULL, '
+                'PRIMARY KEY (kind, object_id))')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {TABLE}_document '
+                f'ON {TABLE} USING gin (document)')
+
+    def index(self, kind, object_id, heading='', body='', parent_id=None):
+        config = settings.SEARCH_CONFIG
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TABLE} '
+                '(kind, object_id, parent_id, document) '
+                'VALUES (%s, %s, %s, '
+                'setweight(to_tsvector(%s, %s), \'A\') '
+                '|| setweight(to_tsvector(%s, %s), \'D\')) '
+                'ON CONFLICT (kind, object_id) DO UPDATE '
+                'SET parent_id = EXCLUDED.parent_id, '
+                'document = EXCLUDED.document',
+                (kind, object_id, parent_id, config, heading, config, body))
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s',
+                (kind, object_id))
+
+    def search(self, kind, query, parent_id=None, limit=None):
+        sql = (f'SELECT object_id FROM {TABLE}, '
+               'plainto_tsquery(%s, %s) AS query '
+               'WHERE kind = %s AND document @@ query')
+        params = [settings.SEARCH_CONFIG, query, kind]
+        if parent_id is not None:
+            sql += ' AND parent_id = %s'
+            params.append(int(parent_id))
+        sql += ' ORDER BY ts_rank(document, query) DESC'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [object_id for object_id, in cursor.fetchall()]
+
+
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
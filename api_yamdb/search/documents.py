@@ -0,0 +1,30 @@
+def title_document(title):
+    return {'heading': title.name, 'body': title.description}
+
+
+def review_document(review):
+    return {'body': review.text, 'parent_id': review.title_id}
+
+
+def comment_document(comment):
+    return {'body': comment.text, 'parent_id': comment.review_id}
+
+
+# Вид документа, модель приложения reviews и построитель документа.
+DOCUMENTS = (
+    ('title', 'Title', title_document),
+    ('review', 'Review', review_document),
+    ('comment', 'Comment', comment_document),
+)
+
+
+def rebuild_index(backend, get_model, chunk_size=2000):
+    """Перестраивает индекс целиком; get_model нужен и для миграций."""
+    backend.clear()
+    indexed = 0
+    for kind, model_name, build in DOCUMENTS:
+        model = get_model('reviews', model_name)
+        for obj in model.objects.order_by().iterator(chunk_size=chunk_size):
+            backend.index(kind, obj.pk, **build(obj))
+            indexed += 1
+    return indexed
@@ -0,0 +1,15 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from search.backends import get_backend
+from search.documents import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text index of titles, reviews and comments'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_index(get_backend(), apps.get_model)
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt: {indexed} documents'))
@@ -0,0 +1,24 @@
+from django.db import migrations
+from search.backends import get_backend
+from search.documents import rebuild_index
+
+
+def install(apps, schema_editor):
+    backend = get_backend()
+    backend.install()
+    rebuild_index(backend, apps.get_model)
+
+
+def uninstall(apps, schema_editor):
+    get_backend().uninstall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0023_tableversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
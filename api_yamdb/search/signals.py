@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from reviews.models import Comment, Review, Title
+from search.backends import get_backend
+from search.documents import DOCUMENTS
+
+MODELS = {'Title': Title, 'Review': Review, 'Comment': Comment}
+
+
+def connect(kind, model, build):
+
+    def index_document(sender, instance, **kwargs):
+        get_backend().index(kind, instance.pk, **build(instance))
+
+    def remove_document(sender, instance, **kwargs):
+        get_backend().remove(kind, instance.pk)
+
+    post_save.connect(index_document, sender=model, weak=False,
+                      dispatch_uid=f'search_index_{kind}')
+    post_delete.connect(remove_document, sender=model, weak=False,
+                        dispatch_uid=f'search_remove_{kind}')
+
+
+for kind, model_name, build in DOCUMENTS:
+    connect(kind, MODELS[model_name], build)
@@ -0,0 +1,94 @@
+"""Стеммер Snowball для русского языка.
+
+Используется бэкендом SQLite, у которого нет русской морфологии:
+в индекс и в запрос попадают основы слов.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'),
+                     ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = (('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой',
+              'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их',
+              'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'),)
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = (('ся', 'сь'),)
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+         'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+         'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = (('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+         'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+         'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+         'ья', 'я'),)
+SUPERLATIVE = (('ейш', 'ейше'),)
+DERIVATIONAL = (('ост', 'ость'),)
+
+
+def find_region(word, start=0):
+    """Начало области после первой пары «гласная + согласная»."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def remove_ending(word, groups, region):
+    """Удаляет самое длинное окончание из групп внутри области.
+
+    Окончания первой из двух групп должны идти после «а» или «я».
+    Возвращает (слово, найдено ли окончание).
+    """
+    matches = [
+        (len(suffix), number)
+        for number, group in enumerate(groups)
+        for suffix in group
+        if word.endswith(suffix) and len(word) - len(suffix) >= region
+    ]
+    if not matches:
+        return word, False
+    length, number = max(matches)
+    stem = word[:-length]
+    if len(groups) == 2 and number == 0:
+        if not stem or stem[-1] not in 'ая' or len(stem) - 1 < region:
+            return word, False
+    return stem, True
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next((index + 1 for index, letter in enumerate(word)
+               if letter in VOWELS), len(word))
+    r2 = find_region(word, find_region(word))
+
+    word, found = remove_ending(word, PERFECTIVE_GERUND, rv)
+    if not found:
+        word, _ = remove_ending(word, REFLEXIVE, rv)
+        word, found = remove_ending(word, ADJECTIVE, rv)
+        if found:
+            word, _ = remove_ending(word, PARTICIPLE, rv)
+        else:
+            word, found = remove_ending(word, VERB, rv)
+            if not found:
+                word, _ = remove_ending(word, NOUN, rv)
+
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word, _ = remove_ending(word, DERIVATIONAL, r2)
+
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    else:
+        word, found = remove_ending(word, SUPERLATIVE, rv)
+        if found and word.endswith('нн'):
+            word = word[:-1]
+        elif word.endswith('ь') and len(word) - 1 >= rv:
+            word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall(text)]
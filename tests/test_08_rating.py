@@ -0,0 +1,44 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from .common import create_reviews
+
+
+class Test08TitleRating:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rating_follows_review_deletion(self, admin_client, admin):
+        from reviews.models import Title
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        title = Title.objects.get(id=titles[0]['id'])
+        assert (title.rating_sum, title.rating_count) == (12, 3), (
+            'Проверьте, что при создании отзыва обновляются `rating_sum` и `rating_count` произведения'
+        )
+        user.delete()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count, title.rating) == (9, 2, 4.5), (
+            'Проверьте, что при каскадном удалении отзывов пользователя рейтинг произведения пересчитывается'
+        )
+        response = admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/')
+        assert response.status_code == 204
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json().get('rating') == 4, (
+            'Проверьте, что после удаления отзыва `rating` произведения пересчитывается'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_recalculate_ratings_command(self, admin_client, admin):
+        from reviews.models import Title
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        Title.objects.filter(id=titles[0]['id']).update(rating_sum=0, rating_count=0, rating=None)
+        out = StringIO()
+        call_command('recalculate_ratings', stdout=out)
+        assert 'drift: 1' in out.getvalue(), (
+            'Проверьте, что команда `recalculate_ratings` сообщает о расхождениях рейтинга'
+        )
+        title = Title.objects.get(id=titles[0]['id'])
+        assert (title.rating_sum, title.rating_count, title.rating) == (12, 3, 4.0), (
+            'Проверьте, что команда `recalculate_ratings` восстанавливает рейтинг произведения'
+        )
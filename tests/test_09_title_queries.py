@@ -0,0 +1,121 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.pagination import PageNumberPagination
+
+
+def create_catalogue(size):
+    from reviews.models import Category, Genre, Title, TitleGenre
+    category = Category.objects.create(name='Фильм', slug='films')
+    Genre.objects.bulk_create(
+        Genre(name=f'Жанр {i}', slug=f'genre-{i}') for i in range(3)
+    )
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {i}', year=2000, category=category) for i in range(size)
+    )
+    genres = Genre.objects.all()
+    titles = Title.objects.all()
+    TitleGenre.objects.bulk_create(
+        TitleGenre(title=title, genre=genre) for title in titles for genre in genres
+    )
+    return titles
+
+
+class Test09TitleQueries:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('page_size', (10, 100, 1000))
+    def test_01_title_list_constant_queries(self, client, monkeypatch, django_assert_num_queries, page_size):
+        create_catalogue(page_size)
+        monkeypatch.setattr(PageNumberPagination, 'page_size', page_size)
+        with django_assert_num_queries(4):
+            response = client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['results']) == page_size
+        assert len(data['results'][0]['genre']) == 3, (
+            'Проверьте, что при GET запросе `/api/v1/titles/` возвращаются жанры произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_detail_queries(self, client, django_assert_num_queries):
+        titles = create_catalogue(1)
+        with django_assert_num_queries(3):
+            response = client.get(f'/api/v1/titles/{titles[0].id}/')
+        assert response.status_code == 200
+        assert response.json()['category']['slug'] == 'films'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_genre_change_refreshes_fragments(self, client, admin_client):
+        from api import cache
+        from reviews.models import GENRE_STAMP, TITLE_STAMP, Genre, TableVersion
+        titles = create_catalogue(1)
+        url = f'/api/v1/titles/{titles[0].id}/'
+        assert client.get(url).json()['genre'][0]['name'] == 'Жанр 2'
+        genre = Genre.objects.get(slug='genre-2')
+        genre.name = 'Драма'
+        genre.save()
+        assert client.get(url).json()['genre'][0]['name'] == 'Драма', (
+            'Проверьте, что после изменения жанра произведения отдают его новое название'
+        )
+        # Изменение из другого процесса: сигналы этого процесса не
+        # срабатывают, меняются только версии таблиц и общий кэш ответов.
+        Genre.objects.filter(pk=genre.pk).update(name='Комедия')
+        TableVersion.objects.bump(GENRE_STAMP, TITLE_STAMP)
+        cache.invalidate(cache.TITLE_DETAILS)
+        assert client.get(url).json()['genre'][0]['name'] == 'Комедия', (
+            'Проверьте, что кэш жанров сверяется с той же версией таблиц, что и ETag ответа'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_genre_slugs_resolved_in_one_query(self, admin_client):
+        from reviews.models import Genre, TitleGenre
+        Genre.objects.bulk_create(Genre(name=f'Жанр {i}', slug=f'genre-{i}') for i in range(10))
+        admin_client.post('/api/v1/categories/', data={'name': 'Фильм', 'slug': 'films'})
+        counts = []
+        for size in (1, 10):
+            data = {'name': 'Произведение', 'year': 2000, 'category': 'films',
+                    'genre': [f'genre-{i}' for i in range(size)]}
+            with CaptureQueriesContext(connection) as context:
+                response = admin_client.post('/api/v1/titles/', data=data, format='json')
+            assert response.status_code == 201, response.content
+            counts.append(len(context))
+        assert counts[0] == counts[1], (
+            'Проверьте, что slug жанров разрешаются одним запросом, а связи пишутся одной вставкой'
+        )
+        data['genre'] = ['genre-1', 'unknown', 'genre-2', 'missing']
+        response = admin_client.post('/api/v1/titles/', data=data, format='json')
+        assert response.status_code == 400
+        errors = response.json()['genre']
+        assert len(errors) == 2 and 'unknown' in errors[0] and 'missing' in errors[1], (
+            'Проверьте, что в ошибке перечислены все неизвестные slug жанров'
+        )
+        title_id = admin_client.get('/api/v1/titles/').json()['results'][0]['id']
+        links = dict(TitleGenre.objects.filter(title_id=title_id, genre__slug='genre-5').values_list('genre_id', 'pk'))
+        response = admin_client.patch(f'/api/v1/titles/{title_id}/', data={'genre': ['genre-5', 'genre-0']},
+                                      format='json')
+        assert response.status_code == 200
+        assert set(response.json()['genre']) == {'genre-0', 'genre-5'}
+        assert dict(TitleGenre.objects.filter(title_id=title_id, genre__slug='genre-5').values_list(
+            'genre_id', 'pk')) == links, (
+            'Проверьте, что при смене жанров сохранившиеся связи не пересоздаются'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_stale_request_keeps_fragments(self):
+        from api.fragments import FragmentCache
+        from api.serializers import GenreSerializer
+        from reviews.models import GENRE_STAMP, Genre
+        fragments = FragmentCache(GenreSerializer, GENRE_STAMP)
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        assert fragments.get(genre, 2)['name'] == 'Драма'
+        # Запрос из соседнего потока прочитал версию до изменения жанра.
+        stale = Genre(pk=genre.pk, name='Комедия', slug='drama')
+        assert fragments.get(stale, 1)['name'] == 'Комедия'
+        assert fragments.get(genre, 2)['name'] == 'Драма', (
+            'Проверьте, что запрос со старой версией таблицы не сбрасывает кэш '
+            'фрагментов и не сохраняет в него устаревшие данные'
+        )
+        assert fragments.get(stale, 3)['name'] == 'Комедия', (
+            'Проверьте, что новая версия таблицы сбрасывает кэш фрагментов'
+        )
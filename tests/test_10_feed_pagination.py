@@ -0,0 +1,43 @@
+import pytest
+
+from .common import create_comments
+
+
+class Test10FeedPagination:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_reviews_cursor_mode(self, client, admin_client, admin, monkeypatch):
+        from api.pagination import FeedCursorPagination
+        monkeypatch.setattr(FeedCursorPagination, 'page_size', 2)
+        _, reviews, titles, _, _ = create_comments(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        response = client.get(url)
+        assert 'count' in response.json(), (
+            'Проверьте, что по умолчанию `/api/v1/titles/{title_id}/reviews/` использует постраничную пагинацию'
+        )
+        response = client.get(url, {'pagination': 'cursor'})
+        data = response.json()
+        assert 'count' not in data and data['previous'] is None, (
+            'Проверьте, что в курсорном режиме не возвращается `count`'
+        )
+        assert len(data['results']) == 2 and 'cursor=' in data['next'], (
+            'Проверьте, что в курсорном режиме возвращается ссылка `next` с курсором'
+        )
+        ids = [review['id'] for review in data['results']]
+        data = client.get(data['next']).json()
+        ids += [review['id'] for review in data['results']]
+        assert data['next'] is None and 'cursor=' in data['previous']
+        assert ids == sorted((review['id'] for review in reviews), reverse=True), (
+            'Проверьте, что курсорная пагинация отдаёт отзывы от новых к старым без пропусков'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_comments_cursor_mode(self, client, admin_client, admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        response = client.get(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/', {'pagination': 'cursor'}
+        )
+        data = response.json()
+        assert 'count' not in data and len(data['results']) == len(comments), (
+            'Проверьте, что `/api/v1/titles/{title_id}/reviews/{review_id}/comments/` поддерживает курсорный режим'
+        )
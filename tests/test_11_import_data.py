@@ -0,0 +1,153 @@
+import csv
+from concurrent.futures import Future
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+
+class StubExecutor:
+    """Откладывает задачи до stub_wait, который выполняет по одной."""
+
+    def __init__(self, events):
+        self.events = events
+        self.tasks = {}
+
+    def __call__(self, workers, mp_context=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.tasks[future] = (fn, args)
+        self.events.append(('submit', args[0]))
+        return future
+
+    def wait(self, futures, return_when=None):
+        future = next(future for future in self.tasks if future in futures)
+        fn, args = self.tasks.pop(future)
+        future.set_result(fn(*args))
+        return {future}, set(futures) - {future}
+
+
+def stub_load_shard(events):
+    def load_shard(name, start, end, batch_size, reject_path):
+        events.append(('run', name))
+        # Каждый шард отклоняет одну строку со своим началом.
+        with open(reject_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(('model', 'start', 'error'))
+            writer.writerow((name, start, 'stub'))
+        return name, start, end, 1, 0.0, 1
+    return load_shard
+
+
+class Test11ImportData:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_import_and_reject(self, tmp_path):
+        from reviews.models import Comment, Review, Title, TitleGenre
+        reject_file = tmp_path / 'rejected.csv'
+        call_command('add_data_to_db', batch_size=7, reject_file=str(reject_file), stdout=StringIO())
+        assert not reject_file.exists(), (
+            'Проверьте, что команда `add_data_to_db` импортирует тестовые данные без отказов'
+        )
+        assert (Title.objects.count(), TitleGenre.objects.count(),
+                Review.objects.count(), Comment.objects.count()) == (32, 42, 72, 3)
+        assert not Title.objects.filter(rating_count__gt=0, rating__isnull=True).exists(), (
+            'Проверьте, что после импорта рейтинг произведений пересчитан'
+        )
+        out = StringIO()
+        call_command('add_data_to_db', reject_file=str(reject_file), stdout=out)
+        assert 'rows/sec' in out.getvalue()
+        with open(reject_file, newline='', encoding='utf-8') as f:
+            rejected = list(csv.DictReader(f))
+        assert len(rejected) == 172, (
+            'Проверьте, что повторно импортируемые строки попадают в файл отказов'
+        )
+        assert Review.objects.count() == 72
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_import_reaches_change_feed(self, admin_client, tmp_path):
+        from reviews.models import Comment, Review, Title
+        call_command('add_data_to_db', reject_file=str(tmp_path / 'rejected.csv'), stdout=StringIO())
+        response = admin_client.get('/api/v1/changes/', {'limit': 5000})
+        assert response.status_code == 200
+        data = response.json()
+        assert not data['has_more']
+        created = {(event['kind'], event['id']) for event in data['events'] if event['action'] == 'created'}
+        assert created == (
+            {('title', pk) for pk in Title.objects.values_list('pk', flat=True)}
+            | {('review', pk) for pk in Review.objects.values_list('pk', flat=True)}
+            | {('comment', pk) for pk in Comment.objects.values_list('pk', flat=True)}
+        ), 'Проверьте, что импорт CSV попадает в ленту изменений'
+        title = next(event for event in data['events'] if event['kind'] == 'title')
+        assert title['data']['name'] == Title.objects.get(pk=title['id']).name
+
+    def test_03_shards_keep_multiline_rows(self):
+        from reviews.management.commands.add_data_to_db import name_path, read_chunks, split_shards
+        path = name_path['Review']
+        shards = split_shards(path, 1000)
+        assert len(shards) > 1
+        rows = [row for start, end in shards for chunk in read_chunks(path, 10, start, end) for row in chunk]
+        assert [row['id'] for row in rows] == [row['id'] for chunk in read_chunks(path, 10) for row in chunk], (
+            'Проверьте, что шарды файла покрывают все строки CSV и не разрезают многострочные значения'
+        )
+
+    def test_04_parallel_load_follows_dependencies(self, monkeypatch, tmp_path):
+        from reviews.management.commands import add_data_to_db
+        from reviews.management.commands.add_data_to_db import LOADERS, Command, name_path, split_shards
+        events = []
+        executor = StubExecutor(events)
+        monkeypatch.setattr(add_data_to_db, 'ProcessPoolExecutor', executor)
+        monkeypatch.setattr(add_data_to_db, 'wait', executor.wait)
+        monkeypatch.setattr(add_data_to_db, 'load_shard', stub_load_shard(events))
+        reject_file = tmp_path / 'rejected.csv'
+        command = Command(stdout=StringIO())
+        rejected = command.load_parallel(4, 10, str(reject_file), 1000)
+        shards = {loader.name: split_shards(name_path[loader.name], 1000) for loader in LOADERS}
+        assert len(shards['Review']) > 1
+        assert rejected == sum(len(parts) for parts in shards.values())
+        for loader in LOADERS:
+            submitted = events.index(('submit', loader.name))
+            for parent in loader.depends_on:
+                runs = [index for index, event in enumerate(events) if event == ('run', parent)]
+                assert len(runs) == len(shards[parent]) and max(runs) < submitted, (
+                    f'Проверьте, что {loader.name} загружается только после всех шардов {parent}'
+                )
+        first_run = events.index(next(event for event in events if event[0] == 'run'))
+        assert {name for action, name in events[:first_run]} == {'Category', 'Genre', 'User'}, (
+            'Проверьте, что независимые модели загружаются одновременно'
+        )
+        with open(reject_file, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        submitted = [name for action, name in events if action == 'submit']
+        assert rows[0] == ['model', 'start', 'error']
+        assert [row[0] for row in rows[1:]] == submitted, (
+            'Проверьте, что файлы отказов шардов сливаются в порядке запуска'
+        )
+        assert [int(row[1]) for row in rows[1:] if row[0] == 'Review'] == [
+            start for start, end in shards['Review']]
+        assert not list(tmp_path.glob('rejected.csv.*')), (
+            'Проверьте, что файлы отказов шардов удаляются после слияния'
+        )
+
+    def test_05_merge_rejects_keeps_order(self, tmp_path):
+        from reviews.management.commands.add_data_to_db import Command
+        parts = []
+        for number in (2, 0, 1):
+            part = tmp_path / f'rejected.csv.Title.{number}'
+            part.write_text(f'id,error\n{number},bad\n', encoding='utf-8')
+            parts.append(str(part))
+        parts.insert(1, str(tmp_path / 'rejected.csv.Title.missing'))
+        reject_file = tmp_path / 'rejected.csv'
+        Command().merge_rejects(parts, str(reject_file))
+        assert reject_file.read_text(encoding='utf-8') == 'id,error\n2,bad\n0,bad\n1,bad\n', (
+            'Проверьте, что отказы сливаются в порядке частей с одним заголовком'
+        )
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['rejected.csv']
@@ -0,0 +1,81 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .common import create_titles
+
+
+def stateless_client(user):
+    from api.authentication import get_access_token
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {get_access_token(user)}')
+    return client
+
+
+class Test12StatelessAuth:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_no_user_query(self, admin_client, user):
+        titles, _, _ = create_titles(admin_client)
+        client = stateless_client(user)
+        client.get('/api/v1/users/me/')
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(f'/api/v1/titles/{titles[0]["id"]}/reviews/', data={'text': 'Ок', 'score': 7})
+        assert response.status_code == 201
+        assert response.json()['author'] == user.username
+        assert not any('FROM "reviews_user"' in query['sql'] for query in context.captured_queries), (
+            'Проверьте, что аутентификация по токену с claims не обращается к таблице пользователей'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_me_loads_full_profile(self, user):
+        response = stateless_client(user).get('/api/v1/users/me/')
+        assert response.status_code == 200
+        assert response.json()['bio'] == 'user bio'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_role_change_revokes_token(self, admin_client, user):
+        client = stateless_client(user)
+        assert client.get('/api/v1/users/me/').status_code == 200
+        response = admin_client.patch(f'/api/v1/users/{user.username}/', data={'role': 'moderator'})
+        assert response.status_code == 200
+        assert client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что после смены роли через `/api/v1/users/{username}/` старый токен отзывается'
+        )
+        user.refresh_from_db()
+        response = stateless_client(user).get('/api/v1/users/me/')
+        assert response.json()['role'] == 'moderator'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_deactivation_revokes_token(self, admin_client, user):
+        titles, _, _ = create_titles(admin_client)
+        client = stateless_client(user)
+        assert client.get('/api/v1/users/me/').status_code == 200
+        user.is_active = False
+        user.save()
+        assert client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что деактивация пользователя отзывает его токены'
+        )
+        response = stateless_client(user).post(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/', data={'text': 'Ок', 'score': 7})
+        assert response.status_code == 401, (
+            'Проверьте, что токен неактивного пользователя отвергается'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_model_changes_revoke_token(self, user):
+        from reviews.models import User
+        client = stateless_client(user)
+        assert client.get('/api/v1/users/me/').status_code == 200
+        user = User.objects.get(pk=user.pk)
+        user.bio = 'Новая биография'
+        user.save()
+        assert client.get('/api/v1/users/me/').status_code == 200, (
+            'Проверьте, что изменение прочих полей не отзывает токены'
+        )
+        user.is_superuser = True
+        user.save(update_fields=('is_superuser',))
+        assert client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что смена is_superuser вне API отзывает токены'
+        )
@@ -0,0 +1,73 @@
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+
+class Test13EmailQueue:
+    url_signup = '/api/v1/auth/signup/'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_signup_queues_email(self, client):
+        from reviews.models import QueuedEmail
+        outbox_before_count = len(mail.outbox)
+        response = client.post(self.url_signup, data={'email': 'queued@yamdb.fake', 'username': 'queued'})
+        assert response.status_code == 200
+        assert len(mail.outbox) == outbox_before_count, (
+            f'Проверьте, что при POST запросе `{self.url_signup}` письмо ставится в очередь, а не отправляется сразу'
+        )
+        email = QueuedEmail.objects.get()
+        assert email.recipient == 'queued@yamdb.fake' and email.sent is None
+        call_command('send_queued_emails', stdout=StringIO())
+        email.refresh_from_db()
+        assert email.sent is not None and email.attempts == 1
+        assert len(mail.outbox) == outbox_before_count + 1
+        call_command('send_queued_emails', stdout=StringIO())
+        assert len(mail.outbox) == outbox_before_count + 1, (
+            'Проверьте, что команда `send_queued_emails` не отправляет письмо повторно'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_failed_email_is_retried_later(self, settings, monkeypatch):
+        from django.core.mail.backends.locmem import EmailBackend
+        from reviews.models import QueuedEmail
+
+        def broken_send(self, messages):
+            raise ConnectionError('SMTP недоступен')
+
+        monkeypatch.setattr(EmailBackend, 'send_messages', broken_send)
+        email = QueuedEmail.objects.create(
+            subject='Тема', body='Текст', from_email='from@yamdb.ru', recipient='to@yamdb.fake'
+        )
+        call_command('send_queued_emails', stdout=StringIO())
+        email.refresh_from_db()
+        assert email.sent is None and email.attempts == 1 and 'SMTP' in email.last_error
+        assert email.next_attempt > timezone.now(), (
+            'Проверьте, что неотправленное письмо откладывается с задержкой'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_connection_failure_reschedules_batch(self, monkeypatch):
+        from django.core.mail.backends.locmem import EmailBackend
+        from reviews.models import QueuedEmail
+
+        def broken_open(self):
+            raise ConnectionError('SMTP недоступен')
+
+        monkeypatch.setattr(EmailBackend, 'open', broken_open, raising=False)
+        QueuedEmail.objects.bulk_create(
+            QueuedEmail(subject='Тема', body='Текст', from_email='from@yamdb.ru', recipient=f'to{i}@yamdb.fake')
+            for i in range(3)
+        )
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        assert 'failed: 3' in out.getvalue(), (
+            'Проверьте, что ошибка подключения к почтовому серверу не останавливает команду'
+        )
+        emails = QueuedEmail.objects.all()
+        assert all(email.sent is None and email.attempts == 1 for email in emails)
+        assert all(email.next_attempt > timezone.now() and 'SMTP' in email.last_error for email in emails), (
+            'Проверьте, что при недоступном сервере вся пачка откладывается с задержкой'
+        )
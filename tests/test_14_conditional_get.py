@@ -0,0 +1,80 @@
+import pytest
+
+from .common import create_genre, create_titles
+
+
+def age_stamps(seconds=2):
+    from datetime import timedelta
+
+    from reviews.models import TableVersion
+    for stamp in TableVersion.objects.all():
+        stamp.updated -= timedelta(seconds=seconds)
+        stamp.save()
+
+
+class Test14ConditionalGet:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_titles_not_modified(self, client, admin_client, django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        age_stamps()
+        for url in ('/api/v1/titles/', f'/api/v1/titles/{titles[0]["id"]}/'):
+            response = client.get(url)
+            etag = response.get('ETag')
+            assert etag and response.get('Last-Modified'), (
+                f'Проверьте, что GET запрос `{url}` возвращает заголовки `ETag` и `Last-Modified`'
+            )
+            with django_assert_num_queries(1):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304, (
+                f'Проверьте, что GET запрос `{url}` с совпадающим `If-None-Match` возвращает статус 304'
+            )
+            assert response['ETag'] == etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_writes_change_etag(self, client, admin_client, admin):
+        titles, _, genres = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        etag = client.get(url)['ETag']
+        genre_etag = client.get('/api/v1/genres/')['ETag']
+        admin_client.post(f'/api/v1/titles/{titles[0]["id"]}/reviews/', data={'text': 'Ок', 'score': 5})
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response['ETag'] != etag, (
+            'Проверьте, что новый отзыв меняет `ETag` списка произведений'
+        )
+        assert client.get('/api/v1/genres/')['ETag'] == genre_etag
+        etag = response['ETag']
+        admin_client.delete(f'/api/v1/genres/{genres[0]["slug"]}/')
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200, (
+            'Проверьте, что удаление жанра меняет `ETag` списка произведений'
+        )
+        assert client.get('/api/v1/genres/', HTTP_IF_NONE_MATCH=genre_etag).status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_etag_depends_on_query(self, client, admin_client):
+        create_genre(admin_client)
+        etag = client.get('/api/v1/genres/')['ETag']
+        response = client.get('/api/v1/genres/?search=Драма', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что `ETag` учитывает параметры запроса'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_write_in_same_second(self, client, admin_client):
+        import time
+
+        from django.utils.http import http_date
+        create_genre(admin_client)
+        age_stamps()
+        response = client.get('/api/v1/genres/')
+        last_modified = response['Last-Modified']
+        assert client.get('/api/v1/genres/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+        admin_client.post('/api/v1/genres/', data={'name': 'Вестерн', 'slug': 'western'})
+        response = client.get('/api/v1/genres/')
+        assert 'Last-Modified' not in response, (
+            'Проверьте, что `Last-Modified` не отдаётся, пока версия таблицы моложе секунды'
+        )
+        response = client.get('/api/v1/genres/', HTTP_IF_MODIFIED_SINCE=http_date(int(time.time())))
+        assert response.status_code == 200, (
+            'Проверьте, что запись в ту же секунду не даёт 304 по `If-Modified-Since`'
+        )
@@ -0,0 +1,75 @@
+import pytest
+
+from .common import create_reviews
+
+
+class Test15ResponseCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_anonymous_reads_are_cached(self, client, admin_client, admin, django_assert_num_queries):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        expected = client.get(url, {'page': 1}).json()
+        with django_assert_num_queries(0):
+            response = client.get(url, {'page': 1})
+        assert response.json() == expected, (
+            f'Проверьте, что повторный анонимный GET запрос `{url}` отдаётся из кэша'
+        )
+        assert admin_client.get(url).json() == expected
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_review_invalidates_its_title_only(self, client, admin_client, admin, user_client):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        urls = (
+            '/api/v1/titles/', f'/api/v1/titles/{first}/', f'/api/v1/titles/{first}/reviews/',
+            f'/api/v1/titles/{second}/', f'/api/v1/titles/{second}/reviews/',
+        )
+        before = {url: client.get(url).json() for url in urls}
+        response = user_client.post(f'/api/v1/titles/{second}/reviews/', data={'text': 'Ок', 'score': 10})
+        assert response.status_code == 201
+        after = {url: client.get(url).json() for url in urls}
+        assert after[f'/api/v1/titles/{second}/reviews/']['count'] == 1, (
+            'Проверьте, что новый отзыв сбрасывает кэш списка отзывов произведения'
+        )
+        assert after[f'/api/v1/titles/{second}/']['rating'] == 10
+        assert after['/api/v1/titles/'] != before['/api/v1/titles/']
+        assert after[f'/api/v1/titles/{first}/'] == before[f'/api/v1/titles/{first}/']
+        assert after[f'/api/v1/titles/{first}/reviews/'] == before[f'/api/v1/titles/{first}/reviews/']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_invalidation_after_commit(self, client):
+        from api import cache
+        from django.db import transaction
+        from reviews.models import Genre
+        assert client.get('/api/v1/genres/').json()['count'] == 0
+        before = cache.get_generations([cache.GENRES])
+        with transaction.atomic():
+            Genre.objects.create(name='Вестерн', slug='western')
+            assert cache.get_generations([cache.GENRES]) == before, (
+                'Проверьте, что кэш ответов не сбрасывается до фиксации транзакции: '
+                'чтение старых строк попало бы под новое поколение'
+            )
+        assert cache.get_generations([cache.GENRES]) != before
+        assert client.get('/api/v1/genres/').json()['count'] == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_query_params_are_normalized(self, client, admin_client, admin, django_assert_num_queries):
+        create_reviews(admin_client, admin)
+        client.get('/api/v1/titles/', {'genre': 'horror', 'year': 2000})
+        with django_assert_num_queries(1):
+            client.get('/api/v1/titles/?year=2000&genre=horror')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_host_is_part_of_key(self, client, admin_client):
+        from reviews.models import GENRE_STAMP, Genre, TableVersion
+        Genre.objects.bulk_create(Genre(name=f'Жанр {i}', slug=f'genre-{i}') for i in range(15))
+        TableVersion.objects.bump(GENRE_STAMP)
+        evil = client.get('/api/v1/genres/', HTTP_HOST='evil.example').json()
+        assert evil['next'].startswith('http://evil.example/')
+        response = client.get('/api/v1/genres/').json()
+        assert response['next'].startswith('http://testserver/'), (
+            'Проверьте, что ответ с чужим заголовком Host не отдаётся из кэша другим клиентам'
+        )
+        secure = client.get('/api/v1/genres/', secure=True).json()
+        assert secure['next'].startswith('https://testserver/')
@@ -0,0 +1,48 @@
+import pytest
+
+from .common import create_reviews, create_titles
+
+
+class Test16FullTextSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_titles_search(self, client, admin_client):
+        create_titles(admin_client)
+        response = client.get('/api/v1/titles/', {'q': 'повороты'})
+        assert response.status_code == 200
+        names = [title['name'] for title in response.json()['results']]
+        assert names == ['Поворот туда'], (
+            'Проверьте, что поиск `?q=` на `/api/v1/titles/` учитывает словоформы'
+        )
+        response = client.get('/api/v1/titles/', {'q': 'драмой'})
+        assert [title['name'] for title in response.json()['results']] == ['Проект'], (
+            'Проверьте, что поиск `?q=` на `/api/v1/titles/` ищет по описанию'
+        )
+        assert client.get('/api/v1/titles/', {'q': 'нетакогослова'}).json()['count'] == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_relevance_order(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.patch(f'/api/v1/titles/{titles[0]["id"]}/', data={'description': 'Проект года'})
+        response = client.get('/api/v1/titles/', {'q': 'проект'})
+        names = [title['name'] for title in response.json()['results']]
+        assert names == ['Проект', 'Поворот туда'], (
+            'Проверьте, что совпадение в названии ранжируется выше совпадения в описании'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_reviews_search_and_sync(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        response = client.get(url, {'q': 'qwerty123'})
+        assert [review['id'] for review in response.json()['results']] == [reviews[1]['id']], (
+            f'Проверьте, что поиск `?q=` на `{url}` находит отзыв по тексту'
+        )
+        assert client.get(f'/api/v1/titles/{titles[1]["id"]}/reviews/', {'q': 'qwerty123'}).json()['count'] == 0
+        admin_client.patch(f'{url}{reviews[0]["id"]}/', data={'text': 'Отличная экранизация'})
+        response = client.get(url, {'q': 'экранизации'})
+        assert [review['id'] for review in response.json()['results']] == [reviews[0]['id']], (
+            'Проверьте, что поисковый индекс обновляется при изменении отзыва'
+        )
+        admin_client.delete(f'{url}{reviews[0]["id"]}/')
+        assert client.get(url, {'q': 'экранизации'}).json()['count'] == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from .common import create_titles
+
+
+class Test17TitleFacets:
+    url = '/api/v1/titles/facets/'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_facet_counts(self, client, admin_client, django_assert_max_num_queries):
+        create_titles(admin_client)
+        with django_assert_max_num_queries(5):
+            response = client.get(self.url)
+        assert response.status_code == 200, (
+            f'Страница `{self.url}` не найдена, проверьте этот адрес в *urls.py*'
+        )
+        data = response.json()
+        assert data['count'] == 2
+        assert {genre['slug']: genre['count'] for genre in data['genres']} == {'horror': 1, 'comedy': 1, 'drama': 1}
+        assert {category['slug']: category['count'] for category in data['categories']} == {'films': 1, 'books': 1}
+        assert data['years'] == [{'year': 2000, 'count': 1}, {'year': 2020, 'count': 1}]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_facets_follow_filters_and_changes(self, client, admin_client):
+        create_titles(admin_client)
+        data = client.get(self.url, {'category': 'films'}).json()
+        assert data['count'] == 1 and data['years'] == [{'year': 2000, 'count': 1}], (
+            f'Проверьте, что `{self.url}` учитывает параметры фильтрации списка произведений'
+        )
+        assert [genre['slug'] for genre in data['genres']] == ['comedy', 'horror']
+        admin_client.post('/api/v1/titles/', data={'name': 'Третий', 'year': 2000, 'genre': ['drama'], 'category': 'films'})
+        data = client.get(self.url, {'category': 'films'}).json()
+        assert data['count'] == 2 and data['years'] == [{'year': 2000, 'count': 2}], (
+            f'Проверьте, что кэш `{self.url}` сбрасывается при добавлении произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_facets_with_search(self, client, admin_client):
+        create_titles(admin_client)
+        response = client.get(self.url, {'q': 'проект'})
+        assert response.status_code == 200, (
+            f'Проверьте, что бюджет запросов `{self.url}` учитывает поиск `?q=`'
+        )
+        data = response.json()
+        assert data['count'] == 1 and data['years'] == [{'year': 2020, 'count': 1}], (
+            f'Проверьте, что `{self.url}` учитывает поиск `?q=`'
+        )
@@ -0,0 +1,48 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .common import create_comments
+
+
+def list_query_plan(client, url, table):
+    """План основного запроса списка: SELECT из таблицы с LIMIT."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    sql = next(
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql'] and 'LIMIT' in query['sql']
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class Test18QueryPlans:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_list_queries_use_indexes(self, client, admin_client, admin):
+        _, reviews, titles, _, _ = create_comments(admin_client, admin)
+        title_id, review_id = titles[0]['id'], reviews[0]['id']
+        cases = (
+            # (url, таблица, таблицы, которые нельзя читать полным перебором)
+            ('/api/v1/titles/', 'reviews_title', ()),
+            ('/api/v1/titles/?category=films', 'reviews_title', ('reviews_title',)),
+            ('/api/v1/titles/?genre=drama', 'reviews_title', ('reviews_title', 'reviews_titlegenre')),
+            ('/api/v1/genres/', 'reviews_genre', ()),
+            ('/api/v1/categories/', 'reviews_category', ()),
+            (f'/api/v1/titles/{title_id}/reviews/', 'reviews_review', ('reviews_review',)),
+            (f'/api/v1/titles/{title_id}/reviews/?pagination=cursor', 'reviews_review', ('reviews_review',)),
+            (f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/', 'reviews_comment', ('reviews_comment',)),
+        )
+        for url, table, indexed_tables in cases:
+            plan = list_query_plan(client, url, table)
+            for table_name in indexed_tables:
+                assert not any(step.startswith(f'SCAN {table_name}') for step in plan), (
+                    f'Запрос списка `{url}` читает `{table_name}` полным перебором: {plan}'
+                )
+            if 'genre=' not in url:
+                assert not any('TEMP B-TREE' in step for step in plan), (
+                    f'Запрос списка `{url}` сортируется без индекса: {plan}'
+                )
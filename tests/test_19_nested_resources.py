@@ -0,0 +1,30 @@
+import pytest
+
+from .common import create_comments
+
+
+class Test19NestedResources:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_review_chain_is_checked(self, client, admin_client, admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        url = f'/api/v1/titles/{titles[1]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        assert client.get(url).status_code == 404, (
+            'Проверьте, что комментарии отзыва, не принадлежащего произведению из адреса, не возвращаются'
+        )
+        assert client.get(f'{url}{comments[0]["id"]}/').status_code == 404
+        response = admin_client.post(url, data={'text': 'Мимо'})
+        assert response.status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_nested_queries(self, client, admin_client, admin, django_assert_num_queries):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        base = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}'
+        with django_assert_num_queries(1):
+            response = client.get(f'{base}/comments/{comments[0]["id"]}/')
+        assert response.json()['author'] == admin.username
+        with django_assert_num_queries(1):
+            client.get(f'{base}/')
+        with django_assert_num_queries(3):
+            response = client.get(f'{base}/comments/')
+        assert len(response.json()['results']) == len(comments)
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+from django.db import connections
+
+from .common import auth_client, create_titles
+
+
+class Test20ConcurrentReview:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_duplicate_review_is_400(self, admin_client, user):
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        client = auth_client(user)
+        assert client.post(url, data={'text': 'Раз', 'score': 5}).status_code == 201
+        response = client.post(url, data={'text': 'Два', 'score': 6})
+        assert response.status_code == 400, (
+            'Проверьте, что повторный отзыв на произведение возвращает статус 400'
+        )
+        assert response.json() == {
+            'non_field_errors': ['На каждое произведение можно оставить только одно ревью']
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_parallel_posts(self, admin_client, user):
+        from reviews.models import Review, Title
+        titles, _, _ = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        workers = 8
+        barrier = threading.Barrier(workers)
+        statuses = []
+
+        def post(number):
+            client = auth_client(user)
+            barrier.wait()
+            try:
+                response = client.post(url, data={'text': f'Отзыв {number}', 'score': 5})
+                statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post, args=(number,)) for number in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(statuses) == [201] + [400] * (workers - 1), (
+            'Проверьте, что из параллельных отзывов одного автора создаётся ровно один, '
+            f'а остальные получают статус 400, получено: {statuses}'
+        )
+        assert Review.objects.filter(title_id=titles[0]['id'], author=user).count() == 1
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.rating_count, title.rating) == (1, 5), (
+            'Проверьте, что отклонённые отзывы не меняют рейтинг произведения'
+        )
@@ -0,0 +1,86 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+SIZES = ['--users', '5', '--genres', '3', '--categories', '2', '--titles', '10',
+         '--reviews', '30', '--comments', '40']
+
+
+class Test21Bench:
+
+    def test_01_percentile(self):
+        from bench.report import percentile
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50.5
+        assert percentile(values, 99) == pytest.approx(99.01)
+        assert percentile([7], 95) == 7
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_seed(self):
+        from bench.seed import seed
+        from reviews.models import Review, Title
+        sizes = seed({'users': 3, 'titles': 4, 'reviews': 100, 'comments': 5})
+        assert sizes['reviews'] == 12, (
+            'Проверьте, что отзывов не больше, чем уникальных пар произведение-автор'
+        )
+        assert Review.objects.count() == 12
+        title = Title.objects.filter(rating_count__gt=0).first()
+        assert title.rating is not None, 'Проверьте, что после наполнения пересчитываются рейтинги'
+        from reviews.models import ChangeEvent
+        created = set(ChangeEvent.objects.filter(action='created').values_list('kind', 'object_id'))
+        assert {object_id for kind, object_id in created if kind == 'review'} == set(
+            Review.objects.values_list('pk', flat=True)), (
+            'Проверьте, что наполнение базы пишет события ленты изменений'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_baseline_roundtrip(self, tmp_path):
+        baseline = tmp_path / 'baseline.json'
+        call_command('bench_api', '--seed', '--noinput', *SIZES, '--requests', '3', '--warmup', '1',
+                     '--save-baseline', str(baseline), stdout=StringIO())
+        data = json.loads(baseline.read_text())
+        summary = data['results']['inprocess']['title-detail']
+        assert set(summary) >= {'p50', 'p95', 'p99', 'rps', 'queries', 'requests', 'errors'}
+        assert summary['requests'] == 3
+        assert summary['errors'] == 0
+        for endpoint in data['results']['inprocess'].values():
+            endpoint['queries'] = 0
+        baseline.write_text(json.dumps(data))
+        with pytest.raises(CommandError, match='queries'):
+            call_command('bench_api', '--requests', '3', '--warmup', '1',
+                         '--compare', str(baseline), stdout=StringIO())
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_http_servers(self, tmp_path):
+        baseline = tmp_path / 'baseline.json'
+        call_command('bench_api', '--seed', '--noinput', *SIZES, '--mode', 'wsgi', 'asgi', '--requests', '3',
+                     '--concurrency', '2', '--endpoint', 'titles-list', '--endpoint', 'users-me',
+                     '--save-baseline', str(baseline), stdout=StringIO())
+        results = json.loads(baseline.read_text())['results']
+        assert set(results) == {'wsgi', 'asgi'}
+        for mode in results.values():
+            assert set(mode) == {'titles-list', 'users-me'}
+            assert all(summary['errors'] == 0 for summary in mode.values()), (
+                'Проверьте, что WSGI- и ASGI-серверы отвечают на запросы прогона без ошибок'
+            )
+            assert mode['users-me']['queries'] is not None, (
+                'Проверьте, что число запросов к базе берётся из заголовка Server-Timing'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_seed_asks_for_confirmation(self, monkeypatch):
+        from reviews.models import Genre
+        Genre.objects.create(name='Драма', slug='drama')
+        prompts = []
+        monkeypatch.setattr('builtins.input', lambda prompt: prompts.append(prompt) or 'no')
+        stdout = StringIO()
+        call_command('bench_api', '--seed', *SIZES, '--requests', '1', stdout=stdout)
+        assert prompts and 'Seeding cancelled' in stdout.getvalue(), (
+            'Проверьте, что `bench_api --seed` без `--noinput` спрашивает подтверждение'
+        )
+        assert Genre.objects.filter(slug='drama').exists(), (
+            'Проверьте, что без подтверждения `bench_api --seed` не удаляет данные'
+        )
@@ -0,0 +1,49 @@
+import logging
+import re
+
+import pytest
+
+from .common import create_titles
+
+
+class Test22QueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_server_timing(self, client, admin_client):
+        create_titles(admin_client)
+        response = client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        header = response.get('Server-Timing', '')
+        match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+', header)
+        assert match, f'Проверьте, что ответ содержит заголовок Server-Timing, получено: {header!r}'
+        assert int(match.group(1)) > 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_strict_mode_raises(self, client, admin_client, monkeypatch):
+        from api.middleware import QueryBudgetExceeded
+        from api.views import TitleViewSet
+        create_titles(admin_client)
+        monkeypatch.setattr(TitleViewSet, 'query_budget', {'list': 1})
+        with pytest.raises(QueryBudgetExceeded, match='TitleViewSet.list'):
+            client.get('/api/v1/titles/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_warning_without_strict(self, client, admin_client, monkeypatch, settings, caplog):
+        from api.views import TitleViewSet
+        create_titles(admin_client)
+        settings.QUERY_BUDGET_STRICT = False
+        monkeypatch.setattr(TitleViewSet, 'query_budget', {'list': 1})
+        with caplog.at_level(logging.WARNING, logger='api.query_budget'):
+            response = client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        assert any('TitleViewSet.list exceeded' in record.getMessage() for record in caplog.records), (
+            'Проверьте, что превышение бюджета запросов пишется в лог'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_budget_per_action(self, client, admin_client, monkeypatch):
+        from api.views import TitleViewSet
+        titles, _, _ = create_titles(admin_client)
+        monkeypatch.setattr(TitleViewSet, 'query_budget', {'list': 1})
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.status_code == 200, 'Проверьте, что действия без бюджета не проверяются'
@@ -0,0 +1,59 @@
+import os
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from .common import create_titles
+
+
+def profiles(directory):
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+class Test23Profiling:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_disabled_by_default(self, client, admin_client, settings, tmp_path):
+        settings.PROFILING_DIR = str(tmp_path / 'profiles')
+        create_titles(admin_client)
+        client.get('/api/v1/titles/', HTTP_X_PROFILE='1')
+        assert profiles(settings.PROFILING_DIR) == [], (
+            'Проверьте, что без настройки и без токена администратора запросы не профилируются'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_sampled_requests(self, client, admin_client, settings, tmp_path):
+        settings.PROFILING_DIR = str(tmp_path / 'profiles')
+        titles, _, _ = create_titles(admin_client)
+        settings.PROFILING_ENABLED = True
+        settings.PROFILING_SAMPLE_RATE = 1
+        client.get('/api/v1/titles/')
+        client.get('/api/v1/titles/?year=2000')
+        client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert profiles(settings.PROFILING_DIR) == ['GET-titles-detail', 'GET-titles-list'], (
+            'Проверьте, что статистика собирается отдельно по каждому представлению'
+        )
+        out = StringIO()
+        call_command('profile_report', '--view', 'titles-list', '--limit', '5', stdout=out)
+        output = out.getvalue()
+        assert 'GET-titles-list: 2 requests' in output
+        assert 'GET-titles-detail' not in output
+        assert 'function calls' in output
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_admin_header(self, admin, user, settings, tmp_path):
+        from api.authentication import get_access_token
+        settings.PROFILING_DIR = str(tmp_path / 'profiles')
+        for account in (user, admin):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {get_access_token(account)}')
+            client.get('/api/v1/users/me/', HTTP_X_PROFILE='1')
+            if account is user:
+                assert profiles(settings.PROFILING_DIR) == [], (
+                    'Проверьте, что заголовок профилирования работает только для администратора'
+                )
+        assert profiles(settings.PROFILING_DIR) == ['GET-users-me']
+        call_command('profile_report', '--clear', stdout=StringIO())
+        assert not os.path.exists(settings.PROFILING_DIR)
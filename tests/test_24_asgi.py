@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from django.core.wsgi import get_wsgi_application
+
+from .common import create_titles
+
+
+def call_asgi(application, method, path, query=b'', body=b'', headers=()):
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query,
+        'headers': [(b'host', b'testserver'), *headers], 'http_version': '1.1',
+        'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+        'root_path': '',
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start = sent[0]
+    content = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], dict(start['headers']), content
+
+
+@pytest.fixture
+def asgi_application():
+    from api.asgi import ASGIHandler
+    application = ASGIHandler(get_wsgi_application(), 2, 2)
+    yield application
+    application.executor.shutdown()
+    application.read_executor.shutdown()
+
+
+class Test24ASGI:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_read_matches_wsgi(self, client, admin_client, asgi_application):
+        titles, _, _ = create_titles(admin_client)
+        status, headers, content = call_asgi(asgi_application, 'GET', '/api/v1/titles/', b'year=2000')
+        assert status == 200
+        assert headers[b'content-type'] == b'application/json'
+        assert json.loads(content) == client.get('/api/v1/titles/?year=2000').json(), (
+            'Проверьте, что ASGI-приложение отдаёт тот же ответ, что и WSGI'
+        )
+        status, _, _ = call_asgi(asgi_application, 'GET', f'/api/v1/titles/{titles[0]["id"]}/')
+        assert status == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_write_with_body(self, token_admin, asgi_application):
+        from reviews.models import Genre
+        body = json.dumps({'name': 'Вестерн', 'slug': 'western'}).encode()
+        status, _, content = call_asgi(asgi_application, 'POST', '/api/v1/genres/', body=body, headers=(
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'authorization', f'Bearer {token_admin["access"]}'.encode()),
+        ))
+        assert status == 201, content
+        assert Genre.objects.filter(slug='western').exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_read_pool(self, admin_client, asgi_application, monkeypatch):
+        from api import asgi
+        titles, _, _ = create_titles(admin_client)
+        threads = set()
+        run_wsgi = asgi_application.run_wsgi
+
+        def record(environ):
+            threads.add(threading.current_thread().name.split('_')[0])
+            return run_wsgi(environ)
+
+        monkeypatch.setattr(asgi_application, 'run_wsgi', record)
+        call_asgi(asgi_application, 'GET', f'/api/v1/titles/{titles[0]["id"]}/reviews/')
+        assert threads == {'asgi-read'}, 'Проверьте, что чтение обслуживается отдельным пулом потоков'
+        threads.clear()
+        call_asgi(asgi_application, 'GET', '/api/v1/users/me/')
+        assert threads == {'asgi'}
+        assert asgi.is_read_request({'method': 'GET', 'path': '/api/v1/genres/'})
+        assert not asgi.is_read_request({'method': 'POST', 'path': '/api/v1/genres/'})
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_stream_survives_other_requests(self, admin_client, token_admin):
+        from api.asgi import ASGIHandler
+        from reviews.models import Category, Title
+        create_titles(admin_client)
+        category = Category.objects.get(slug='films')
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {i}', year=2000, category=category) for i in range(3000))
+        application = ASGIHandler(get_wsgi_application(), 1, 1)
+        authorization = (b'authorization', f'Bearer {token_admin["access"]}'.encode())
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/api/v1/export/titles/', 'query_string': b'',
+            'headers': [(b'host', b'testserver'), authorization], 'http_version': '1.1',
+            'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+            'root_path': '',
+        }
+        sent = []
+        statuses = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.body' and len(statuses) < 3:
+                # Другой запрос в тот же пул посреди выгрузки.
+                status, _, _ = await asyncio.get_running_loop().run_in_executor(
+                    None, lambda: call_asgi(application, 'GET', '/api/v1/users/me/', headers=(authorization,)))
+                statuses.append(status)
+
+        try:
+            asyncio.run(application(scope, receive, send))
+        finally:
+            application.executor.shutdown()
+            application.read_executor.shutdown()
+        assert statuses == [200, 200, 200]
+        content = b''.join(message.get('body', b'') for message in sent[1:])
+        assert len(content.decode().splitlines()) == Title.objects.count(), (
+            'Проверьте, что потоковый ответ не обрывается, когда пул обслуживает другие запросы'
+        )
+
+    def test_05_lifespan(self, asgi_application):
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(asgi_application({'type': 'lifespan'}, receive, send))
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
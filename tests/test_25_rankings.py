@@ -0,0 +1,109 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from .common import create_reviews
+
+RATED = '/api/v1/titles/top/rated/'
+DISCUSSED = '/api/v1/titles/top/discussed/'
+
+
+def ranked(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.content
+    return [(item['title']['id'], item['score']) for item in response.json()['results']]
+
+
+class Test25Rankings:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rated_and_discussed(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        admin_client.post(f'/api/v1/titles/{second}/reviews/', data={'text': 'Шедевр', 'score': 9})
+        assert ranked(client, RATED) == [(second, 9), (first, 4)], (
+            'Проверьте, что рейтинг лучших произведений отсортирован по убыванию оценки'
+        )
+        assert ranked(client, DISCUSSED) == [(first, 3), (second, 1)]
+        response = client.get(RATED)
+        item = response.json()['results'][0]
+        assert set(item['title']) == {'id', 'name', 'year', 'rating', 'description', 'genre', 'category'}
+        assert 'next' in response.json() and 'count' not in response.json(), (
+            'Проверьте, что рейтинги используют курсорную пагинацию'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_scopes(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        admin_client.post(f'/api/v1/titles/{second}/reviews/', data={'text': 'Шедевр', 'score': 9})
+        assert ranked(client, f'{RATED}?genre=comedy') == [(first, 4)]
+        assert ranked(client, f'{RATED}?genre=drama') == [(second, 9)]
+        assert ranked(client, f'{RATED}?category=films') == [(first, 4)]
+        assert client.get(f'{RATED}?genre=unknown').status_code == 404
+        assert client.get(f'{RATED}?genre=drama&category=books').status_code == 400
+        admin_client.patch(f'/api/v1/titles/{second}/', data={'genre': ['horror'], 'category': 'films'})
+        assert ranked(client, f'{RATED}?genre=drama') == []
+        assert ranked(client, f'{RATED}?genre=horror') == [(second, 9), (first, 4)], (
+            'Проверьте, что смена жанров произведения переносит его в рейтинги новых жанров'
+        )
+        admin_client.delete('/api/v1/categories/films/')
+        assert ranked(client, RATED) == [(second, 9), (first, 4)]
+        from reviews.models import TitleRanking
+        assert not TitleRanking.objects.filter(scope__startswith='category:').exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_incremental_updates(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        first = titles[0]['id']
+        admin_client.patch(f'/api/v1/titles/{first}/reviews/{reviews[0]["id"]}/', data={'score': 8})
+        assert ranked(client, RATED) == [(first, 5)]
+        admin_client.delete(f'/api/v1/titles/{first}/reviews/{reviews[0]["id"]}/')
+        assert ranked(client, RATED) == [(first, 3.5)]
+        assert ranked(client, DISCUSSED) == [(first, 2)]
+        admin_client.delete(f'/api/v1/titles/{first}/')
+        assert ranked(client, RATED) == [], 'Проверьте, что удалённое произведение пропадает из рейтингов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_refresh_moves_window(self, client, admin_client, admin):
+        from reviews.models import Review, TitleRanking
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        Review.objects.filter(pk=reviews[0]['id']).update(pub_date=timezone.now() - timedelta(days=30))
+        TitleRanking.objects.all().delete()
+        call_command('refresh_rankings', stdout=StringIO())
+        assert ranked(client, DISCUSSED) == [(titles[0]['id'], 2)], (
+            'Проверьте, что refresh_rankings учитывает только отзывы за последние дни'
+        )
+        assert ranked(client, RATED) == [(titles[0]['id'], 4)]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_one_refresh_per_transaction(self, admin_client, admin, monkeypatch):
+        from django.db import transaction
+        from reviews import rankings
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        refreshed = []
+        refresh_title = rankings.refresh_title
+        monkeypatch.setattr(rankings, 'refresh_title', lambda title_id: (
+            refreshed.append(title_id), refresh_title(title_id)))
+        with transaction.atomic():
+            for _ in range(3):
+                rankings.schedule_refresh(first)
+            rankings.schedule_refresh(second)
+            assert refreshed == []
+        assert refreshed == [first, second], (
+            'Проверьте, что рейтинги произведения пересчитываются один раз после фиксации транзакции'
+        )
+        refreshed.clear()
+        with pytest.raises(ZeroDivisionError):
+            with transaction.atomic():
+                rankings.schedule_refresh(first)
+                1 / 0
+        with transaction.atomic():
+            rankings.schedule_refresh(second)
+        assert second in refreshed, (
+            'Проверьте, что откат транзакции не отменяет пересчёт в следующей'
+        )
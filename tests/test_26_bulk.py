@@ -0,0 +1,199 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .common import create_reviews, create_titles
+
+TITLES = '/api/v1/titles/bulk/'
+GENRES = '/api/v1/genres/bulk/'
+CATEGORIES = '/api/v1/categories/bulk/'
+
+
+def title_items(count, genre=('horror', 'comedy'), category='films'):
+    return [
+        {'name': f'Произведение {i}', 'year': 2000 + i % 20, 'genre': list(genre),
+         'category': category, 'description': f'Описание {i}'}
+        for i in range(count)
+    ]
+
+
+class Test26Bulk:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_bulk_create_titles(self, client, admin_client, user_client):
+        create_titles(admin_client)
+        items = title_items(3)
+        assert user_client.post(TITLES, data=items, format='json').status_code == 403
+        assert client.post(TITLES, data=items, content_type='application/json').status_code == 401
+        response = admin_client.post(TITLES, data=items, format='json')
+        assert response.status_code == 201, response.content
+        data = response.json()
+        assert data['created'] == 3 and data['failed'] == 0
+        assert [item['index'] for item in data['results']] == [0, 1, 2]
+        for item, result in zip(items, data['results']):
+            title = client.get(f'/api/v1/titles/{result["id"]}/').json()
+            assert title['name'] == item['name'], (
+                'Проверьте, что id в ответе пакетного создания указывают на созданные произведения'
+            )
+            assert {genre['slug'] for genre in title['genre']} == {'horror', 'comedy'}
+            assert title['category']['slug'] == 'films'
+        assert client.get('/api/v1/titles/').json()['count'] == 5
+        response = client.get('/api/v1/titles/?q=Произведение')
+        assert response.json()['count'] == 3, (
+            'Проверьте, что пакетное создание добавляет произведения в поисковый индекс'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_partial_failure(self, client, admin_client):
+        create_titles(admin_client)
+        items = title_items(4)
+        items[1]['genre'] = ['horror', 'unknown', 'missing']
+        items[2]['category'] = 'unknown'
+        items[3]['year'] = 'не год'
+        response = admin_client.post(TITLES, data=items, format='json')
+        assert response.status_code == 207, response.content
+        data = response.json()
+        assert data['created'] == 1 and data['failed'] == 3
+        results = data['results']
+        assert results[0]['status'] == 201
+        assert results[1]['status'] == 400 and len(results[1]['errors']['genre']) == 2, (
+            'Проверьте, что все неизвестные slug элемента перечислены в ошибке'
+        )
+        assert 'category' in results[2]['errors']
+        assert 'year' in results[3]['errors']
+        assert client.get('/api/v1/titles/').json()['count'] == 3
+        response = admin_client.post(TITLES, data=items[1:], format='json')
+        assert response.status_code == 400
+        assert response.json()['created'] == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_invalid_payload(self, admin_client, settings):
+        assert admin_client.post(TITLES, data={'name': 'Не список'}, format='json').status_code == 400
+        assert admin_client.post(TITLES, data=[], format='json').status_code == 400
+        settings.BULK_MAX_ITEMS = 2
+        response = admin_client.post(TITLES, data=title_items(3), format='json')
+        assert response.status_code == 400, (
+            'Проверьте, что размер пакета ограничен настройкой BULK_MAX_ITEMS'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('method', ('post', 'patch'))
+    def test_04_constant_queries(self, admin_client, method):
+        titles, _, _ = create_titles(admin_client)
+        counts = []
+        for size in (3, 30):
+            items = title_items(size, genre=('drama',), category='books')
+            if method == 'patch':
+                response = admin_client.post(TITLES, data=items, format='json')
+                items = [{'id': result['id'], 'genre': ['horror'], 'category': 'films'}
+                         for result in response.json()['results']]
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(admin_client, method)(TITLES, data=items, format='json')
+            assert response.status_code in (200, 201), response.content
+            counts.append(len(context))
+        assert counts[0] == counts[1], (
+            'Проверьте, что число запросов пакетной записи не зависит от числа элементов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_bulk_update_titles(self, client, admin_client, admin):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        items = [
+            {'id': first, 'name': 'Новое название', 'genre': ['drama']},
+            {'id': second, 'category': 'films'},
+            {'id': first, 'year': 1999},
+            {'id': 10 ** 6, 'name': 'Нет такого'},
+            {'name': 'Без id'},
+        ]
+        response = admin_client.patch(TITLES, data=items, format='json')
+        assert response.status_code == 207, response.content
+        data = response.json()
+        assert data['updated'] == 2 and data['failed'] == 3
+        assert [item['status'] for item in data['results']] == [200, 200, 400, 400, 400], (
+            'Проверьте, что повтор id, неизвестный id и отсутствие id - ошибки элемента'
+        )
+        title = client.get(f'/api/v1/titles/{first}/').json()
+        assert title['name'] == 'Новое название'
+        assert [genre['slug'] for genre in title['genre']] == ['drama']
+        assert title['year'] == titles[0]['year']
+        assert client.get(f'/api/v1/titles/{second}/').json()['category']['slug'] == 'films'
+        rated = client.get('/api/v1/titles/top/rated/?genre=drama').json()['results']
+        assert [item['title']['id'] for item in rated] == [first], (
+            'Проверьте, что смена жанров в пакете обновляет рейтинги'
+        )
+        assert client.get('/api/v1/titles/?q=Новое').json()['count'] == 1
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url', (GENRES, CATEGORIES))
+    def test_06_dictionaries(self, client, admin_client, url):
+        list_url = url.replace('bulk/', '')
+        admin_client.post(list_url, data={'name': 'Старое', 'slug': 'old'})
+        items = [
+            {'name': 'Первое', 'slug': 'first'},
+            {'name': 'Второе', 'slug': 'second'},
+            {'name': 'Повтор', 'slug': 'first'},
+            {'name': 'Занято', 'slug': 'old'},
+            {'name': 'Плохой slug', 'slug': 'пробел и кириллица'},
+            {'name': 'Адрес пакета', 'slug': 'bulk'},
+        ]
+        response = admin_client.post(url, data=items, format='json')
+        assert response.status_code == 207, response.content
+        assert [item['status'] for item in response.json()['results']] == [201, 201, 400, 400, 400, 400], (
+            'Проверьте, что повтор, занятый и зарезервированный slug - ошибки элемента пакета'
+        )
+        assert response.json()['results'][0]['slug'] == 'first'
+        assert admin_client.post(list_url, data={'name': 'Адрес пакета', 'slug': 'bulk'}).status_code == 400, (
+            'Проверьте, что slug `bulk` занят адресом пакетной записи и не может быть у объекта'
+        )
+        assert client.get(list_url).json()['count'] == 3
+        response = admin_client.patch(url, data=[
+            {'slug': 'old', 'name': 'Переименовано'},
+            {'slug': 'unknown', 'name': 'Нет такого'},
+        ], format='json')
+        assert response.status_code == 207, response.content
+        names = {item['slug']: item['name'] for item in client.get(list_url).json()['results']}
+        assert names['old'] == 'Переименовано'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_caches_invalidated(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        assert client.get('/api/v1/genres/').json()['count'] == 3
+        etag = client.get('/api/v1/titles/')['ETag']
+        assert 'Ужасы' in {genre['name'] for genre in client.get(title_url).json()['genre']}
+        admin_client.post(GENRES, data=[{'name': 'Мюзикл', 'slug': 'musical'}], format='json')
+        admin_client.patch(GENRES, data=[{'slug': 'horror', 'name': 'Хоррор'}], format='json')
+        assert client.get('/api/v1/genres/').json()['count'] == 4, (
+            'Проверьте, что пакетная запись сбрасывает кэш списка жанров'
+        )
+        assert 'Хоррор' in {genre['name'] for genre in client.get(title_url).json()['genre']}, (
+            'Проверьте, что пакетное изменение жанров сбрасывает кэш карточек произведений'
+        )
+        response = client.get('/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что пакетная запись меняет версию таблицы произведений'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_ids_with_concurrent_insert(self, client, admin_client, monkeypatch):
+        from reviews.models import Category, Title
+        create_titles(admin_client)
+        bulk_create = Title.objects.bulk_create
+        films = Category.objects.get(slug='films')
+
+        def interleaved(titles, **kwargs):
+            # Строки другого писателя до и после вставки пакета.
+            Title.objects.create(name='Чужое', year=2000, category=films)
+            created = bulk_create(titles, **kwargs)
+            Title.objects.create(name='Чужое', year=2000, category=films)
+            return created
+
+        monkeypatch.setattr(Title.objects, 'bulk_create', interleaved)
+        items = title_items(3)
+        response = admin_client.post(TITLES, data=items, format='json')
+        assert response.status_code == 201, response.content
+        names = [client.get(f'/api/v1/titles/{result["id"]}/').json()['name'] for result in response.json()['results']]
+        assert names == [item['name'] for item in items], (
+            'Проверьте, что id созданных произведений не берутся из чужих строк'
+        )
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import time
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .common import create_comments, create_titles
+
+
+def read_ndjson(response):
+    assert response.status_code == 200, response.content
+    assert response.streaming, 'Проверьте, что выгрузка отдаётся StreamingHttpResponse'
+    content = b''.join(response.streaming_content).decode()
+    return [json.loads(line) for line in content.splitlines()]
+
+
+class Test27Export:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_titles_ndjson(self, client, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        assert client.get('/api/v1/export/titles/').status_code == 401
+        assert user_client.get('/api/v1/export/titles/').status_code == 403
+        assert admin_client.get('/api/v1/export/users/').status_code == 404
+        response = admin_client.get('/api/v1/export/titles/')
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        rows = read_ndjson(response)
+        assert [row['id'] for row in rows] == sorted(title['id'] for title in titles)
+        first = rows[0]
+        assert set(first) == {'id', 'name', 'year', 'description', 'category', 'genre', 'rating', 'updated'}
+        assert first['genre'] == ['comedy', 'horror'] and first['category'] == 'films', (
+            'Проверьте, что в выгрузке произведений есть slug жанров и категории'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reviews_comments_csv(self, admin_client, admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        rows = read_ndjson(admin_client.get('/api/v1/export/reviews/'))
+        assert [row['id'] for row in rows] == sorted(review['id'] for review in reviews)
+        assert rows[0]['author'] == admin.username and rows[0]['title'] == titles[0]['id']
+        response = admin_client.get('/api/v1/export/comments/?output=csv')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/csv')
+        content = b''.join(response.streaming_content).decode()
+        table = list(csv.DictReader(io.StringIO(content)))
+        assert [int(row['id']) for row in table] == sorted(comment['id'] for comment in comments)
+        assert table[0]['review'] == str(reviews[0]['id']) and table[0]['title'] == str(titles[0]['id'])
+        response = admin_client.get('/api/v1/export/titles/?output=csv')
+        table = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        assert table[0]['genre'] == 'comedy,horror'
+        assert admin_client.get('/api/v1/export/titles/?output=xml').status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_updated_since(self, admin_client, admin):
+        _, reviews, titles, _, _ = create_comments(admin_client, admin)
+        time.sleep(0.01)
+        since = timezone.now().isoformat()
+        assert read_ndjson(admin_client.get('/api/v1/export/titles/', {'updated_since': since})) == []
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Новое'})
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[1]["id"]}/', data={'score': 10})
+        rows = read_ndjson(admin_client.get('/api/v1/export/titles/', {'updated_since': since}))
+        assert sorted(row['id'] for row in rows) == sorted((titles[0]['id'], titles[1]['id'])), (
+            'Проверьте, что изменение названия или рейтинга попадает в инкрементальную выгрузку'
+        )
+        rows = read_ndjson(admin_client.get('/api/v1/export/reviews/', {'updated_since': since}))
+        assert [row['id'] for row in rows] == [reviews[1]['id']]
+        assert read_ndjson(admin_client.get('/api/v1/export/comments/', {'updated_since': since})) == []
+        response = admin_client.get('/api/v1/export/titles/?updated_since=вчера')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_genre_links(self, admin_client):
+        from reviews.models import TitleGenre
+        titles, _, _ = create_titles(admin_client)
+        time.sleep(0.01)
+        since = timezone.now().isoformat()
+        assert admin_client.delete('/api/v1/genres/horror/').status_code == 204
+        rows = read_ndjson(admin_client.get('/api/v1/export/titles/', {'updated_since': since}))
+        assert [(row['id'], row['genre']) for row in rows] == [(titles[0]['id'], ['comedy'])], (
+            'Проверьте, что удаление жанра попадает в инкрементальную выгрузку его произведений'
+        )
+        time.sleep(0.01)
+        since = timezone.now().isoformat()
+        TitleGenre.objects.get(title_id=titles[1]['id']).delete()
+        rows = read_ndjson(admin_client.get('/api/v1/export/titles/', {'updated_since': since}))
+        assert [(row['id'], row['genre']) for row in rows] == [(titles[1]['id'], [])], (
+            'Проверьте, что изменение связей с жанрами попадает в инкрементальную выгрузку'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_queries_per_chunk(self, admin_client):
+        from reviews.export import export
+        from reviews.models import Category, Genre, Title, TitleGenre
+        create_titles(admin_client)
+        category = Category.objects.get(slug='films')
+        Title.objects.bulk_create(Title(name=f'Произведение {i}', year=2000, category=category) for i in range(48))
+        genre = Genre.objects.get(slug='drama')
+        TitleGenre.objects.bulk_create(TitleGenre(title=title, genre=genre) for title in Title.objects.all())
+        with CaptureQueriesContext(connection) as context:
+            content = ''.join(export('titles', 'ndjson', chunk_size=10))
+        assert len(content.splitlines()) == 50
+        assert len(context) <= 6, (
+            'Проверьте, что жанры произведений выгружаются одним запросом на пачку'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_command(self, admin_client, tmp_path):
+        titles, _, _ = create_titles(admin_client)
+        out = io.StringIO()
+        call_command('export_data', 'titles', stdout=out)
+        assert [json.loads(line)['id'] for line in out.getvalue().splitlines()] == sorted(
+            title['id'] for title in titles)
+        path = tmp_path / 'titles.csv'
+        call_command('export_data', 'titles', format='csv', output=str(path),
+                     updated_since=timezone.now().isoformat())
+        assert path.read_text().splitlines() == [
+            'id,name,year,description,category,genre,rating,updated'
+        ]
@@ -0,0 +1,93 @@
+import pytest
+
+from .common import create_comments, create_titles
+
+URL = '/api/v1/changes/'
+
+
+def read_all(client, since=0, limit=None):
+    events = []
+    while True:
+        params = {'since': since}
+        if limit:
+            params['limit'] = limit
+        response = client.get(URL, params)
+        assert response.status_code == 200, response.content
+        data = response.json()
+        events.extend(data['events'])
+        since = data['cursor']
+        if not data['has_more']:
+            return events, since
+
+
+class Test28Changes:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_events_in_order(self, client, admin_client, user_client, admin):
+        assert client.get(URL).status_code == 401
+        assert user_client.get(URL).status_code == 403
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        events, cursor = read_all(admin_client)
+        cursors = [event['cursor'] for event in events]
+        assert cursors == sorted(cursors) and cursor == cursors[-1], (
+            'Проверьте, что события ленты отдаются по возрастанию курсора'
+        )
+        created = [(event['kind'], event['id']) for event in events if event['action'] == 'created']
+        assert created == (
+            [('title', title['id']) for title in titles]
+            + [('review', review['id']) for review in reviews]
+            + [('comment', comment['id']) for comment in comments]
+        )
+        review = next(event for event in events if event['kind'] == 'review')
+        assert review['data']['text'] == reviews[0]['text'] and review['data']['author'] == admin.username, (
+            'Проверьте, что к событию приложено состояние объекта'
+        )
+        paged, paged_cursor = read_all(admin_client, limit=2)
+        assert paged == events and paged_cursor == cursor, (
+            'Проверьте, что лента читается пачками по limit без пропусков'
+        )
+        assert admin_client.get(URL, {'since': cursor}).json() == {
+            'events': [], 'cursor': cursor, 'has_more': False
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_updates_and_tombstones(self, admin_client, admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        _, cursor = read_all(admin_client)
+        title_id = titles[0]['id']
+        admin_client.patch(f'/api/v1/titles/{title_id}/reviews/{reviews[1]["id"]}/', data={'text': 'Новый текст'})
+        admin_client.delete(f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/')
+        events, _ = read_all(admin_client, cursor)
+        actions = [(event['kind'], event['id'], event['action']) for event in events]
+        assert actions[0] == ('review', reviews[1]['id'], 'updated')
+        assert events[0]['data']['text'] == 'Новый текст'
+        assert set(actions[1:]) == {
+            ('review', reviews[0]['id'], 'deleted'),
+            *(('comment', comment['id'], 'deleted') for comment in comments),
+        }, 'Проверьте, что каскадное удаление оставляет события удаления для комментариев'
+        assert all(event['data'] is None for event in events[1:])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_title_changes(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        _, cursor = read_all(admin_client)
+        admin_client.patch(f'/api/v1/titles/{titles[0]["id"]}/', data={'genre': ['drama']}, format='json')
+        admin_client.delete('/api/v1/categories/books/')
+        admin_client.patch('/api/v1/titles/bulk/', data=[{'id': titles[0]['id'], 'name': 'Пакет'}], format='json')
+        events, _ = read_all(admin_client, cursor)
+        assert [(event['id'], event['action']) for event in events] == [
+            (titles[0]['id'], 'updated'), (titles[1]['id'], 'updated'), (titles[0]['id'], 'updated')
+        ], 'Проверьте, что смена категории и пакетная запись попадают в ленту'
+        assert events[1]['data']['category'] is None
+        assert events[2]['data']['name'] == 'Пакет'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_export_cursor_and_params(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        _, cursor = read_all(admin_client)
+        response = admin_client.get('/api/v1/export/titles/')
+        assert response['X-Changes-Cursor'] == str(cursor), (
+            'Проверьте, что выгрузка сообщает курсор ленты изменений'
+        )
+        for params in ({'since': -1}, {'since': 'abc'}, {'limit': 0}, {'limit': 10 ** 6}):
+            assert admin_client.get(URL, params).status_code == 400
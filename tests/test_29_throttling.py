@@ -0,0 +1,96 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture
+def rates(settings):
+    def set_rates(**overrides):
+        rest_framework = dict(settings.REST_FRAMEWORK)
+        rest_framework['DEFAULT_THROTTLE_RATES'] = dict(rest_framework['DEFAULT_THROTTLE_RATES'], **overrides)
+        settings.REST_FRAMEWORK = rest_framework
+    return set_rates
+
+
+class Test29Throttling:
+
+    def test_01_token_bucket(self, monkeypatch):
+        from api import throttling
+        now = [1000.0]
+        monkeypatch.setattr(throttling.time, 'time', lambda: now[0])
+        assert [throttling.consume(cache, 'bucket', 3, 60) for _ in range(3)] == [0, 0, 0]
+        wait = throttling.consume(cache, 'bucket', 3, 60)
+        assert 19 < wait <= 20, 'Проверьте, что после опустошения ведра возвращается время до нового токена'
+        assert throttling.consume(cache, 'bucket', 3, 60) == pytest.approx(wait), (
+            'Проверьте, что отклонённый запрос не расходует токен'
+        )
+        now[0] += 20
+        assert throttling.consume(cache, 'bucket', 3, 60) == 0
+        assert throttling.consume(cache, 'bucket', 3, 60) > 0
+        now[0] += 3600
+        assert [throttling.consume(cache, 'bucket', 3, 60) for _ in range(4)][-1] > 0, (
+            'Проверьте, что за время простоя в ведре не накапливается больше токенов, чем его ёмкость'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_auth_endpoints(self, client, rates):
+        rates(auth='3/min')
+        statuses = [
+            client.post('/api/v1/auth/signup/', data={'username': f'user{i}', 'email': f'user{i}@yamdb.fake'}).status_code
+            for i in range(4)
+        ]
+        assert statuses == [200, 200, 200, 429], (
+            'Проверьте, что регистрация ограничена по адресу клиента'
+        )
+        response = client.post('/api/v1/auth/token/', data={'username': 'user0', 'confirmation_code': '1'})
+        assert response.status_code == 429
+        assert int(response['Retry-After']) > 0
+        assert client.get('/api/v1/titles/').status_code == 200, (
+            'Проверьте, что бюджет auth не расходуется другими запросами'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_auth_identity(self, client, rates):
+        rates(auth_identity='2/min')
+        client.post('/api/v1/auth/signup/', data={'username': 'victim', 'email': 'victim@yamdb.fake'})
+        statuses = [
+            client.post('/api/v1/auth/token/', data={'username': ('victim', 'Victim', 'VICTIM')[i], 'confirmation_code': '1'},
+                        REMOTE_ADDR=f'10.0.0.{i}').status_code
+            for i in range(3)
+        ]
+        assert statuses == [400, 429, 429], (
+            'Проверьте, что подбор кода для одного имени ограничен независимо от адреса'
+        )
+        response = client.post('/api/v1/auth/token/', data={'username': 'other', 'confirmation_code': '1'})
+        assert response.status_code != 429
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_role_and_write_budgets(self, client, user_client, admin_client, rates):
+        rates(user_write='2/min', anon='3/min')
+        admin_client.post('/api/v1/genres/', data={'name': 'Драма', 'slug': 'drama'})
+        admin_client.post('/api/v1/categories/', data={'name': 'Фильм', 'slug': 'films'})
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Фильм', 'year': 2000, 'genre': ['drama'], 'category': 'films'})
+        url = f'/api/v1/titles/{response.json()["id"]}/reviews/'
+        assert user_client.post(url, data={'text': 'Хорошо', 'score': 7}).status_code == 201
+        assert user_client.post(url, data={'text': 'Повтор', 'score': 7}).status_code == 400
+        assert user_client.post(url, data={'text': 'Третий', 'score': 7}).status_code == 429, (
+            'Проверьте, что запись ограничена бюджетом роли пользователя'
+        )
+        assert user_client.get(url).status_code == 200, (
+            'Проверьте, что чтение не расходует бюджет записи'
+        )
+        assert admin_client.post(url, data={'text': 'Админ', 'score': 9}).status_code == 201
+        statuses = [client.get('/api/v1/genres/').status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429], 'Проверьте ограничение анонимных запросов по адресу'
+        assert user_client.get('/api/v1/genres/').status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_ip_budget(self, admin_client, user_client, rates):
+        admin_client.post('/api/v1/genres/', data={'name': 'Драма', 'slug': 'drama'})
+        cache.clear()
+        rates(ip='3/min')
+        statuses = [admin_client.get('/api/v1/genres/').status_code for _ in range(2)]
+        statuses += [user_client.get('/api/v1/genres/').status_code for _ in range(2)]
+        assert statuses == [200, 200, 200, 429], (
+            'Проверьте, что запросы разных пользователей с одного адреса ограничены общим бюджетом'
+        )